@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# Name: ids_memory
+# Process: measures with tracemalloc the memory held by the peptide structures
+# of a run when peptide names are kept as strings versus interned in one
+# IdTable with int32 id arrays: the matrix index, a set of bins and a set of
+# enriched peptide lists. Every structure gets its own string objects, as it
+# would when each one is parsed from its own file.
+# Usage: python benchmarks/ids_memory.py [--peptides 250000] [--bins 300]
+# [--enriched 400] [--enriched-fraction 0.01]
+from q2_autopepsirf.utils.ids import IdTable
+
+import argparse
+import numpy as np
+import tracemalloc
+
+
+def peptide_name(i):
+    return "library_prefix_%06d" % (i)
+
+
+def as_strings(n_peptides, bin_ids, enriched_ids):
+    index = [peptide_name(i) for i in range(n_peptides)]
+    bins = [[peptide_name(i) for i in ids] for ids in bin_ids]
+    enriched = [{peptide_name(i) for i in ids} for ids in enriched_ids]
+    return index, bins, enriched
+
+
+def as_ids(n_peptides, bin_ids, enriched_ids):
+    table = IdTable(peptide_name(i) for i in range(n_peptides))
+    bins = [
+        table.encode([peptide_name(i) for i in ids], add=False)
+        for ids in bin_ids
+    ]
+    enriched = [
+        table.encode([peptide_name(i) for i in ids], add=False)
+        for ids in enriched_ids
+    ]
+    return table, bins, enriched
+
+
+def measure(build, *args):
+    tracemalloc.start()
+    held = build(*args)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del held
+    return current
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--peptides", type=int, default=250000)
+    parser.add_argument("--bins", type=int, default=300)
+    parser.add_argument("--enriched", type=int, default=400)
+    parser.add_argument("--enriched-fraction", type=float, default=0.01)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    bin_ids = np.array_split(rng.permutation(args.peptides), args.bins)
+    n_enriched = max(1, int(args.peptides * args.enriched_fraction))
+    enriched_ids = [
+        rng.choice(args.peptides, n_enriched, replace=False)
+        for _ in range(args.enriched)
+    ]
+
+    strings = measure(as_strings, args.peptides, bin_ids, enriched_ids)
+    ids = measure(as_ids, args.peptides, bin_ids, enriched_ids)
+    print("peptides %d, bins %d, enriched sets %d of %d peptides"
+          % (args.peptides, args.bins, args.enriched, n_enriched))
+    print("strings: %.1f MB" % (strings / 1e6))
+    print("IdTable + int32 ids: %.1f MB (%.1fx less)"
+          % (ids / 1e6, strings / max(1, ids)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+# Name: write_tsv
+# Process: times write_tsv against DataFrame.to_csv with a float_format on a
+# random normal peptide x sample matrix, and checks that both files hold the
+# same text
+# Usage: python benchmarks/write_tsv.py [--peptides 2000] [--samples 300]
+# [--precision 2]
+from q2_autopepsirf.utils.matrix import PeptideMatrix, write_tsv
+
+import argparse
+import numpy as np
+import os
+import pandas as pd
+import tempfile
+import time
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    func(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--peptides", type=int, default=2000)
+    parser.add_argument("--samples", type=int, default=300)
+    parser.add_argument("--precision", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    frame = pd.DataFrame(
+        rng.normal(0, 10, (args.peptides, args.samples)),
+        index=pd.Index(
+            ["pep_%d" % (i) for i in range(args.peptides)],
+            name="Sequence name"
+        ),
+        columns=["sample_%d" % (i) for i in range(args.samples)]
+    )
+    matrix = PeptideMatrix.from_frame(frame)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        fast = os.path.join(tmp, "write_tsv.tsv")
+        slow = os.path.join(tmp, "to_csv.tsv")
+        fast_s = timed(write_tsv, matrix, fast, precision=args.precision)
+        slow_s = timed(
+            frame.to_csv, slow, sep="\t",
+            float_format="%%.%df" % (args.precision)
+        )
+        with open(fast, "rb") as a, open(slow, "rb") as b:
+            identical = a.read() == b.read()
+
+    print("%d x %d, precision %d"
+          % (args.peptides, args.samples, args.precision))
+    print("write_tsv: %.2f s" % (fast_s))
+    print("DataFrame.to_csv: %.2f s (%.1fx)" % (slow_s, slow_s / fast_s))
+    print("identical output: %s" % (identical))
+
+
+if __name__ == "__main__":
+    main()
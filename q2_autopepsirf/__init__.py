@@ -2,7 +2,10 @@ from . import _version
 
 __all__ = [
     "diffEnrich", "diffEnrich_tsv",
-    "diffEnrich_deconv", "diffEnrich_deconv_tsv"
+    "diffEnrich_deconv", "diffEnrich_deconv_tsv", "diffEnrich_deconv_sweep",
+    "diffEnrich_append", "negativeControlStats", "pooledNegativeControl",
+    "deferredVisualization", "renderVisualizations", "enrichmentIndex",
+    "warehouseIngest", "mergeZscores"
 ]
 __version__ = _version.get_versions()["version"]
 
@@ -10,4 +13,15 @@ from q2_autopepsirf.actions.diffEnrich import diffEnrich
 from q2_autopepsirf.actions.diffEnrich_tsv import diffEnrich_tsv
 from q2_autopepsirf.actions.diffEnrich_deconv import diffEnrich_deconv
 from q2_autopepsirf.actions.diffEnrich_deconv_tsv import diffEnrich_deconv_tsv
+from q2_autopepsirf.actions.diffEnrich_deconv_sweep import (
+    diffEnrich_deconv_sweep
+)
+from q2_autopepsirf.actions.diffEnrich_append import diffEnrich_append
+from q2_autopepsirf.actions.negativeControlStats import negativeControlStats
+from q2_autopepsirf.actions.pooledNegativeControl import pooledNegativeControl
+from q2_autopepsirf.actions.deferredVisualization import deferredVisualization
+from q2_autopepsirf.actions.renderVisualizations import renderVisualizations
+from q2_autopepsirf.actions.enrichmentIndex import enrichmentIndex
+from q2_autopepsirf.actions.warehouseIngest import warehouseIngest
+from q2_autopepsirf.actions.mergeZscores import mergeZscores
 
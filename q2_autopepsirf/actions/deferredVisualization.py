@@ -0,0 +1,22 @@
+import html
+import os
+
+# Name: deferredVisualization
+# Process: placeholder returned by diffEnrich in place of a visualization that
+# was not rendered. It records where the render data of the run is stored so
+# the real visualization can be built later with render-visualizations.
+# Method Input/Parameters: output_dir, run_dir, visualization
+# Method output/Returned: None
+def deferredVisualization(
+        output_dir: str,
+        run_dir: str,
+        visualization: str) -> None:
+
+    with open(os.path.join(output_dir, "index.html"), "w") as fh:
+        fh.write(
+            "<html><body><h2>%s was not rendered</h2>"
+            "<p>This run was made with --p-defer-visualizations. Render it"
+            " with:</p><pre>qiime autopepsirf render-visualizations"
+            " --p-run-dir %s --output-dir &lt;dir&gt;</pre></body></html>\n"
+            % (html.escape(visualization), html.escape(run_dir))
+        )
@@ -2,12 +2,35 @@ from collections import defaultdict
 from math import inf
 from q2_pepsirf.format_types import(
     PepsirfInfoSumOfProbesFmt, PepsirfInfoSNPNFormat,
-    PepsirfContingencyTSVFormat, ZscoreNanFormat, EnrichedPeptideDirFmt
+    PepsirfContingencyTSVFormat, ZscoreNanFormat, EnrichedPeptideDirFmt,
+    PeptideBinFormat, EnrichThreshFileFormat
+)
+from q2_autopepsirf.format_types import NegativeControlStatsFormat
+from q2_autopepsirf.utils.bitset import EnrichmentBitset
+from q2_autopepsirf.utils.columnar import write_columnar
+from q2_autopepsirf.utils.deferred import VISUALIZATIONS, write_render_data
+from q2_autopepsirf.utils.concordance import (
+    concordance_table, write_concordance
+)
+from q2_autopepsirf.utils.export import enrich_base, export_view
+from q2_autopepsirf.utils.matrix import matrix_view
+from q2_autopepsirf.utils.negstats import stats_to_control
+from q2_autopepsirf.utils.scatter import thin_scatter
+from q2_autopepsirf.utils.schedule import (
+    PEPSIRF_STEPS, niced_binary, step_nice
+)
+from q2_autopepsirf.utils.source import column_groups, write_source_file
+from q2_autopepsirf.utils.threads import ThreadBudget
+from q2_autopepsirf.utils.validate import (
+    parse_thresh, read_matrix_ids, read_samples, validate_inputs
+)
+from q2_autopepsirf.utils.views import ViewCache
+from q2_autopepsirf.utils.zgrid import (
+    grid_counts, write_grid_counts, z_grid
 )
 
-import csv
+import numpy as np
 import os
-import pandas as pd
 import qiime2
 
 # Name: diffenrich
@@ -15,7 +38,9 @@ import qiime2
 # Method Input/Parameters: default ctx, raw_data, bins, negative_controls,
 # negative_ids, negative_names, thresh_file, exact_z_thresh,
 # exact_zenrich_thresh, step_z_thresh, upper_z_thresh, lower_z_thresh,
-# raw_constraint, pepsirf_binary
+# zenrich_counts, replicate_concordance, scatter_grid_size,
+# scatter_outlier_thresh, defer_visualizations, enrich_bitset, n_threads,
+# step_priorities, raw_constraint, pepsirf_binary
 # Method output/Returned: col_sum, diff, diff_ratio, zscore_out, nan_out,
 # sample_names, read_counts, rc_boxplot_out, enrich_dir, enrichedCountsBoxplot,
 # zscore_scatter, colsum_scatter
@@ -31,6 +56,7 @@ def diffEnrich(
         s_enrich_source=False,
         user_defined_source = None,
         negative_control=None,
+        negative_stats=None,
         negative_id=None,
         negative_names=None,
         thresh_file=None,
@@ -44,8 +70,81 @@ def diffEnrich(
         lower_z_thresh=5,
         raw_constraint=300000,
         hdi=0.95,
+        view_cache_mb=1024,
+        export_compression=None,
+        columnar_export=False,
+        zenrich_counts=False,
+        scatter_grid_size=0,
+        scatter_outlier_thresh=10.0,
+        replicate_concordance=False,
+        defer_visualizations=False,
+        enrich_bitset=False,
+        n_threads=None,
+        step_priorities=None,
         pepsirf_binary="pepsirf"):
 
+    # artifact views are shared by every step of this run, in-process work
+    # uses the whole thread budget since it runs after the pepsirf steps
+    budget = ThreadBudget(n_threads)
+    views = ViewCache(
+        max_bytes=view_cache_mb * 1024 * 1024, n_workers=budget.total
+    )
+
+    # zenrich plots the negative control samples themselves, so it is only
+    # given a user provided negative control matrix (not the stats' means)
+    zenrich_negative = negative_control
+
+    # precomputed negative control statistics stand in for the negative
+    # control matrix, so the controls are not aggregated again
+    if negative_stats:
+        if negative_control:
+            raise ValueError(
+                "Provide either negative-control or negative-stats, not both."
+            )
+        neg_tsv = PepsirfContingencyTSVFormat()
+        stats_to_control(
+            str(views.view(negative_stats, NegativeControlStatsFormat)),
+            str(neg_tsv)
+        )
+        negative_control = ctx.make_artifact(
+            type="FeatureTable[Normed]",
+            view=neg_tsv,
+            view_type=PepsirfContingencyTSVFormat
+        )
+
+    # check sample/peptide names and thresholds before any pepsirf step runs
+    validate_inputs(
+        raw_data_path=str(views.view(raw_data, PepsirfContingencyTSVFormat)),
+        bins_path=str(views.view(bins, PeptideBinFormat)),
+        negative_control_path=(
+            str(views.view(negative_control, PepsirfContingencyTSVFormat))
+            if negative_control else None
+        ),
+        negative_id=negative_id,
+        negative_names=negative_names,
+        negative_stats=bool(negative_stats),
+        thresh_file_path=(
+            str(views.view(thresh_file, EnrichThreshFileFormat))
+            if thresh_file else None
+        ),
+        exact_z_thresh=exact_z_thresh,
+        exact_cs_thresh=exact_cs_thresh,
+        exact_zenrich_thresh=exact_zenrich_thresh,
+        # the source file is only used when no source is inferred
+        source_samples=(
+            list(user_defined_source.to_series().index)
+            if user_defined_source and not (
+                infer_pairs_source or flexible_reps_source or s_enrich_source
+            ) else None
+        )
+    )
+
+    if defer_visualizations and not pepsirf_tsv_dir:
+        raise ValueError(
+            "defer-visualizations stores the render data in pepsirf-tsv-dir,"
+            " which must be provided."
+        )
+
     # if pepsirf_tsv_dir provided, make sure the provided dir is not a already
     # created dir otherwise, make it a dir
     if pepsirf_tsv_dir:
@@ -56,6 +155,16 @@ def diffEnrich(
         if not tsv_base_str:
             tsv_base_str = "aps-output"
 
+    # every pepsirf step runs through a wrapper that sets its nice value,
+    # 0 on the critical path (col_sum, diff, zscore, enrich) and higher for
+    # the steps that can wait, so when steps overlap (qiime2's --parallel,
+    # or other jobs on the machine) the critical path gets the cores first
+    nice = step_nice(step_priorities, configurable=PEPSIRF_STEPS)
+    binary = {
+        step: niced_binary(pepsirf_binary, nice[step])
+        for step in PEPSIRF_STEPS
+    }
+
     # collect the actions from ps-plot and q2-pepsirf to be executed
     norm = ctx.get_action("pepsirf", "norm")
     zscore = ctx.get_action("pepsirf", "zscore")
@@ -76,26 +185,26 @@ def diffEnrich(
         negative_names=None,
         precision=2,
         outfile=os.path.join(pepsirf_tsv_dir, "norm.out"),
-        pepsirf_binary=pepsirf_binary
+        pepsirf_binary=binary["col_sum"]
     )
 
-    # convert the qza output into a tsv and save it
-    if pepsirf_tsv_dir and tsv_base_str:
-        cs_base = "%s_CS.tsv" % (tsv_base_str)
-        cs_tsv = col_sum.view(PepsirfContingencyTSVFormat)
-        cs_tsv.save(
-            os.path.join(pepsirf_tsv_dir, cs_base),
-            ext=".tsv"
-        ) #requires qiime2-2021.11
-
     # create list for collection of sample names
     if not negative_names and not negative_id:
         if not negative_control:
             negative_names = []
         else:
-            negDF = negative_control.view(pd.DataFrame)
-            negative_names = list(negDF.index)
-
+            # only the header is needed, the matrix itself is not parsed
+            negative_names = read_samples(
+                str(views.view(
+                    negative_control, PepsirfContingencyTSVFormat
+                ))
+            )
+
+    # with negative stats the control is the synthetic mean column, which
+    # is only meaningful to norm, so zenrich gets no control names
+    norm_names = negative_names
+    if negative_stats:
+        negative_names = None
 
     # run norm module to recieve diff
     diff, = norm(
@@ -103,91 +212,61 @@ def diffEnrich(
         normalize_approach="diff",
         negative_control=negative_control,
         negative_id=negative_id,
-        negative_names=negative_names,
+        negative_names=norm_names,
         precision=2,
         outfile=os.path.join(pepsirf_tsv_dir, "norm.out"),
-        pepsirf_binary=pepsirf_binary
+        pepsirf_binary=binary["diff"]
     )
 
-    # convert the qza output into a tsv and save it
-    if pepsirf_tsv_dir and tsv_base_str:
-        diff_base = "%s_SBD.tsv" % (tsv_base_str)
-        diff_tsv = diff.view(PepsirfContingencyTSVFormat)
-        diff_tsv.save(os.path.join(pepsirf_tsv_dir, diff_base), ext=".tsv")
-
     # run norm module to recieve diff-ratio
     diff_ratio, = norm(
         peptide_scores=col_sum,
         normalize_approach="diff_ratio",
         negative_control=negative_control,
         negative_id=negative_id,
-        negative_names=negative_names,
+        negative_names=norm_names,
         precision=2,
         outfile=os.path.join(pepsirf_tsv_dir, "norm.out"),
-        pepsirf_binary=pepsirf_binary
+        pepsirf_binary=binary["diff_ratio"]
     )
 
-    # convert the qza output into a tsv and save it
-    if pepsirf_tsv_dir and tsv_base_str:
-        diffR_base = "%s_SBDR.tsv" % (tsv_base_str)
-        diffR_tsv = diff_ratio.view(PepsirfContingencyTSVFormat)
-        diffR_tsv.save(os.path.join(pepsirf_tsv_dir, diffR_base), ext=".tsv")
-
     # run zscore module to recieve zscore and nan files
     zscore_out, nan_out = zscore(
         scores=diff,
         bins=bins,
         hdi=hdi,
+        # the single-threaded diff-ratio norm, info steps and read count
+        # boxplot do not depend on zscore and can run alongside it
+        num_threads=budget.share(1, reserved=4),
         outfile=os.path.join(pepsirf_tsv_dir, "zscore.out"),
-        pepsirf_binary=pepsirf_binary
+        pepsirf_binary=binary["zscore"]
     )
 
-    # convert the qza output into a tsv and save it
-    if pepsirf_tsv_dir and tsv_base_str:
-        zscore_base = "%s_Z-HDI%s.tsv" % (tsv_base_str, str(int(hdi * 100)))
-        zscore_tsv = zscore_out.view(PepsirfContingencyTSVFormat)
-        zscore_tsv.save(os.path.join(pepsirf_tsv_dir, zscore_base), ext=".tsv")
-
-        nan_base = "%s_Z-HDI%s.nan" % (tsv_base_str, str(int(hdi * 100)))
-        nan_tsv = nan_out.view(ZscoreNanFormat)
-        nan_tsv.save(os.path.join(pepsirf_tsv_dir, nan_base), ext=".nan")
-
     # run info module to collect sample names
     sample_names, = infoSNPN(
         input=raw_data,
         get="samples",
         outfile=os.path.join(pepsirf_tsv_dir, "info.out"),
-        pepsirf_binary=pepsirf_binary
+        pepsirf_binary=binary["sample_names"]
     )
 
-    # convert the qza output into a tsv and save it
-    if pepsirf_tsv_dir and tsv_base_str:
-        sn_base = "%s_SN.tsv" % (tsv_base_str)
-        sn_tsv = sample_names.view(PepsirfInfoSNPNFormat)
-        sn_tsv.save(os.path.join(pepsirf_tsv_dir, sn_base), ext=".tsv")
-
     # run info to collect read counts
     read_counts, = infoSOP(
         input=raw_data,
         outfile=os.path.join(pepsirf_tsv_dir, "info.out"),
-        pepsirf_binary=pepsirf_binary
+        pepsirf_binary=binary["read_counts"]
     )
 
-    # convert the qza output into a tsv and save it
-    if pepsirf_tsv_dir and tsv_base_str:
-        rc_base = "%s_RC.tsv" % (tsv_base_str)
-        rc_tsv = read_counts.view(PepsirfInfoSumOfProbesFmt)
-        rc_tsv.save(os.path.join(pepsirf_tsv_dir, rc_base), ext=".tsv")
-
     # run readCounts boxplot module to recieve visualization
-    rc_boxplot_out, = RCBoxplot(
-        read_counts=read_counts, png_out_dir=pepsirf_tsv_dir
-    )
+    if not defer_visualizations:
+        rc_boxplot_out, = RCBoxplot(
+            read_counts=read_counts, png_out_dir=pepsirf_tsv_dir
+        )
 
     # create variables for source file creation
     if infer_pairs_source or flexible_reps_source or s_enrich_source:
         sourceDic = defaultdict(list)
-        sampleNM = sample_names.view(PepsirfInfoSNPNFormat)
+        sampleNM = views.view(sample_names, PepsirfInfoSNPNFormat)
         source = os.path.join(pepsirf_tsv_dir, "samples_source.tsv")
 
         # open samples file and collect samples into a dictionary
@@ -205,22 +284,15 @@ def diffEnrich(
         # create a source file written with column 1 as the sample names
         # and the column 2 as the source column
         # the source file will be put in the tsv directory
-        with open( source , "w" ) as tsvWriter:
-            writer = csv.writer(tsvWriter, delimiter="\t")
-            writer.writerow(["sampleID", "source"])
-            for srce, samples in sourceDic.items():
-                if flexible_reps_source:
-                    for name in samples:
-                            writer.writerow([name, srce])
-                elif s_enrich_source:
-                    for name in samples:
-                            writer.writerow([name, name])
-                elif infer_pairs_source:
-                    if len(samples) > 1:
-                        for name in samples:
-                            writer.writerow([name, srce])
-
-        # convert source file to metadata column to be used within the modules
+        write_source_file(
+            sourceDic, source,
+            flexible_reps_source=flexible_reps_source,
+            s_enrich_source=s_enrich_source,
+            infer_pairs_source=infer_pairs_source
+        )
+
+        # convert source file to metadata column to be used within the
+        # modules
         source_col = qiime2.Metadata.load(source).get_column("source")
 
     elif user_defined_source:
@@ -239,70 +311,286 @@ def diffEnrich(
         raw_constraint=raw_constraint,
         enrichment_failure=True,
         outfile=os.path.join(pepsirf_tsv_dir, "enrich.out"),
-        pepsirf_binary=pepsirf_binary
+        pepsirf_binary=binary["enrich"]
+    )
+
+    # run enrichment boxplot module to recieve visualization
+    if not defer_visualizations:
+        enrichedCountsBoxplot, = enrichBoxplot(
+            enriched_dir=enrich_dir, png_out_dir=pepsirf_tsv_dir
+        )
+
+    # on large peptide sets the replicate scatters only receive one
+    # peptide per occupied grid cell of every replicate pair, plus the
+    # peptides with a z score above scatter_outlier_thresh
+    zscore_plot, colsum_plot = zscore_out, col_sum
+    if scatter_grid_size:
+        groups = column_groups(source_col)
+        z_matrix = matrix_view(views, zscore_out)
+        outliers = z_matrix.peptides.decode(np.flatnonzero(
+            (z_matrix.values >= scatter_outlier_thresh).any(axis=1)
+        ))
+        thinned = []
+        for artifact, semantic_type, log in (
+                (zscore_out, "FeatureTable[Zscore]", False),
+                (col_sum, "FeatureTable[Normed]", True)):
+            plot_tsv = PepsirfContingencyTSVFormat()
+            thin_scatter(
+                matrix_view(views, artifact), list(groups.values()),
+                scatter_grid_size, outliers=outliers, log=log,
+                n_workers=views.n_workers
+            ).to_tsv(str(plot_tsv), precision=3)
+            thinned.append(ctx.make_artifact(
+                type=semantic_type,
+                view=plot_tsv,
+                view_type=PepsirfContingencyTSVFormat
+            ))
+        zscore_plot, colsum_plot = thinned
+
+    if not defer_visualizations:
+        # run repScatter module to collect visualization
+        zscore_scatter, = repScatter(
+            source=source_col,
+            plot_log=False,
+            zscore=zscore_plot
+        )
+
+        # run repScatter module to collect visualization
+        colsum_scatter, = repScatter(
+            source=source_col,
+            plot_log=True,
+            col_sum=colsum_plot
+        )
+
+        # run the zenrich module to collect visualization
+        zenrich_out, = zenrich(
+            data=col_sum,
+            zscores=zscore_out,
+            flex_reps=flexible_reps_source,
+            negative_controls=negative_names,
+            negative_id=negative_id,
+            source=source_col,
+            negative_data=zenrich_negative,
+            step_z_thresh=step_z_thresh,
+            upper_z_thresh=upper_z_thresh,
+            lower_z_thresh=lower_z_thresh,
+            exact_z_thresh=exact_zenrich_thresh,
+            exact_cs_thresh=exact_cs_thresh,
+            pepsirf_binary=pepsirf_binary
+        )
+
+    else:
+        # in deferred mode only the data the visualizations are built
+        # from is stored, render-visualizations turns it into
+        # visualizations later
+        source_path = os.path.join(pepsirf_tsv_dir, "render_source.tsv")
+        qiime2.Metadata(source_col.to_dataframe()).save(source_path)
+        run_dir = write_render_data(
+            os.path.join(pepsirf_tsv_dir, "%s_render" % (tsv_base_str)),
+            {
+                "read_counts.tsv": str(
+                    views.view(read_counts, PepsirfInfoSumOfProbesFmt)
+                ),
+                "enriched": str(
+                    views.view(enrich_dir, EnrichedPeptideDirFmt).path
+                ),
+                "col_sum.tsv": str(
+                    views.view(col_sum, PepsirfContingencyTSVFormat)
+                ),
+                "zscore.tsv": str(
+                    views.view(zscore_out, PepsirfContingencyTSVFormat)
+                ),
+                "colsum_plot.tsv": str(
+                    views.view(colsum_plot, PepsirfContingencyTSVFormat)
+                ),
+                "zscore_plot.tsv": str(
+                    views.view(zscore_plot, PepsirfContingencyTSVFormat)
+                ),
+                "negative_control.tsv": (
+                    str(views.view(
+                        zenrich_negative, PepsirfContingencyTSVFormat
+                    )) if zenrich_negative else None
+                ),
+                "source.tsv": source_path
+            },
+            {
+                "png_out_dir": os.path.abspath(pepsirf_tsv_dir),
+                "flexible_reps_source": flexible_reps_source,
+                "negative_names": negative_names,
+                "negative_id": negative_id,
+                "step_z_thresh": step_z_thresh,
+                "upper_z_thresh": upper_z_thresh,
+                "lower_z_thresh": lower_z_thresh,
+                "exact_zenrich_thresh": exact_zenrich_thresh,
+                "exact_cs_thresh": exact_cs_thresh,
+                "pepsirf_binary": pepsirf_binary
+            }
+        )
+        deferred = ctx.get_action("autopepsirf", "deferredVisualization")
+        (rc_boxplot_out, enrichedCountsBoxplot, zscore_scatter,
+         colsum_scatter, zenrich_out) = [
+            deferred(run_dir=run_dir, visualization=name)[0]
+            for name in VISUALIZATIONS
+        ]
+
+    # every pepsirf and ps-plot action has been issued at this point, and
+    # no output is viewed before its consumers were called. Under qiime2's
+    # parallel pipeline executor the renders above run in worker
+    # processes, concurrently with the exports and in-process analysis
+    # below.
+
+    # exports are compressed one at a time, next to the single-threaded
+    # visualizations that may still be rendering
+    export_threads = budget.share(
+        1, reserved=0 if defer_visualizations else len(VISUALIZATIONS)
     )
 
     # convert the qza output into a tsv and save it
     if pepsirf_tsv_dir and tsv_base_str:
-        if exact_z_thresh:
-            enrich_zt = exact_z_thresh.split(",")
-            enrich_cst = exact_cs_thresh.split(",")
-            if len(enrich_zt) > 1:
-                enrich_base = "%s-%sZ-HDI%s_" % (
-                    enrich_zt[0], enrich_zt[1], str(int(hdi * 100))
-                )
-            else:
-                enrich_base = "%sZ-HDI%s_" % (
-                    enrich_zt[0], str(int(hdi * 100))
-                )
-            if len(enrich_cst) > 1:
-                enrich_base += "%s-%sCS_%sraw" % (
-                    enrich_cst[0], enrich_cst[1], str(raw_constraint)
-                )
-            else:
-                enrich_base += "%sCS_%sraw" % (
-                    enrich_cst[0], str(raw_constraint)
+        cs_base = "%s_CS.tsv" % (tsv_base_str)
+        cs_tsv = views.view(col_sum, PepsirfContingencyTSVFormat)
+        export_view(
+            cs_tsv, os.path.join(pepsirf_tsv_dir, cs_base), ext=".tsv",
+            compression=export_compression, n_threads=export_threads
+        ) #requires qiime2-2021.11
+
+        # binary copy for fast per-sample loading downstream
+        if columnar_export:
+            write_columnar(
+                matrix_view(views, col_sum),
+                os.path.join(pepsirf_tsv_dir, "%s_CS" % (tsv_base_str))
+            )
+
+    # convert the qza output into a tsv and save it
+    if pepsirf_tsv_dir and tsv_base_str:
+        diff_base = "%s_SBD.tsv" % (tsv_base_str)
+        diff_tsv = views.view(diff, PepsirfContingencyTSVFormat)
+        export_view(
+            diff_tsv, os.path.join(pepsirf_tsv_dir, diff_base), ext=".tsv",
+            compression=export_compression, n_threads=export_threads
+        )
+
+    # convert the qza output into a tsv and save it
+    if pepsirf_tsv_dir and tsv_base_str:
+        diffR_base = "%s_SBDR.tsv" % (tsv_base_str)
+        diffR_tsv = views.view(diff_ratio, PepsirfContingencyTSVFormat)
+        export_view(
+            diffR_tsv, os.path.join(pepsirf_tsv_dir, diffR_base),
+            ext=".tsv",
+            compression=export_compression, n_threads=export_threads
+        )
+
+    # convert the qza output into a tsv and save it
+    if pepsirf_tsv_dir and tsv_base_str:
+        zscore_base = "%s_Z-HDI%s.tsv" % (
+            tsv_base_str, str(int(hdi * 100))
+        )
+        zscore_tsv = views.view(zscore_out, PepsirfContingencyTSVFormat)
+        export_view(
+            zscore_tsv, os.path.join(pepsirf_tsv_dir, zscore_base),
+            ext=".tsv",
+            compression=export_compression, n_threads=export_threads
+        )
+
+        # binary copy for fast per-sample loading downstream
+        if columnar_export:
+            write_columnar(
+                matrix_view(views, zscore_out),
+                os.path.join(
+                    pepsirf_tsv_dir,
+                    "%s_Z-HDI%s" % (tsv_base_str, str(int(hdi * 100)))
                 )
-        else:
-            enrich_base = "enriched"
-        enrich_tsv = enrich_dir.view(EnrichedPeptideDirFmt)
-        enrich_tsv.save(os.path.join(pepsirf_tsv_dir, enrich_base))
+            )
 
-    # run enrichment boxplot module to recieve visualization
-    enrichedCountsBoxplot, = enrichBoxplot(
-        enriched_dir=enrich_dir, png_out_dir=pepsirf_tsv_dir
-    )
+        nan_base = "%s_Z-HDI%s.nan" % (tsv_base_str, str(int(hdi * 100)))
+        nan_tsv = views.view(nan_out, ZscoreNanFormat)
+        export_view(
+            nan_tsv, os.path.join(pepsirf_tsv_dir, nan_base), ext=".nan",
+            compression=export_compression, n_threads=export_threads
+        )
 
-    # run repScatter module to collect visualization
-    zscore_scatter, = repScatter(
-        source=source_col,
-        plot_log=False,
-        zscore=zscore_out
-    )
+    # convert the qza output into a tsv and save it
+    if pepsirf_tsv_dir and tsv_base_str:
+        sn_base = "%s_SN.tsv" % (tsv_base_str)
+        sn_tsv = views.view(sample_names, PepsirfInfoSNPNFormat)
+        export_view(
+            sn_tsv, os.path.join(pepsirf_tsv_dir, sn_base), ext=".tsv",
+            compression=export_compression, n_threads=export_threads
+        )
 
-    # run repScatter module to collect visualization
-    colsum_scatter, = repScatter(
-        source=source_col,
-        plot_log=True,
-        col_sum=col_sum
-    )
+    # convert the qza output into a tsv and save it
+    if pepsirf_tsv_dir and tsv_base_str:
+        rc_base = "%s_RC.tsv" % (tsv_base_str)
+        rc_tsv = views.view(read_counts, PepsirfInfoSumOfProbesFmt)
+        export_view(
+            rc_tsv, os.path.join(pepsirf_tsv_dir, rc_base), ext=".tsv",
+            compression=export_compression, n_threads=export_threads
+        )
 
-    # run the zenrich module to collect visualization
-    zenrich_out, = zenrich(
-        data=col_sum,
-        zscores=zscore_out,
-        flex_reps=flexible_reps_source,
-        negative_controls=negative_names,
-        negative_id=negative_id,
-        source=source_col,
-        negative_data=negative_control,
-        step_z_thresh=step_z_thresh,
-        upper_z_thresh=upper_z_thresh,
-        lower_z_thresh=lower_z_thresh,
-        exact_z_thresh=exact_zenrich_thresh,
-        exact_cs_thresh=exact_cs_thresh,
-        pepsirf_binary=pepsirf_binary
-    )
+    # convert the qza output into a tsv and save it
+    if pepsirf_tsv_dir and tsv_base_str:
+        enrich_tsv = views.view(enrich_dir, EnrichedPeptideDirFmt)
+        export_view(
+            enrich_tsv,
+            os.path.join(
+                pepsirf_tsv_dir,
+                enrich_base(
+                    exact_z_thresh, exact_cs_thresh, hdi, raw_constraint
+                )
+            ),
+            compression=export_compression, n_threads=export_threads
+        )
+
+        # bit-packed copy of the enriched peptides, its peptide columns
+        # follow the rows of the col-sum matrix
+        if enrich_bitset:
+            _, peptide_ids = read_matrix_ids(
+                str(views.view(col_sum, PepsirfContingencyTSVFormat))
+            )
+            EnrichmentBitset.from_dir(
+                str(enrich_tsv.path), peptide_ids
+            ).save(os.path.join(
+                pepsirf_tsv_dir, "%s_enriched_bits.npz" % (tsv_base_str)
+            ))
+
+    # per replicate pair correlation and agreement of the data behind the
+    # z score and col-sum scatter plots
+    if replicate_concordance and pepsirf_tsv_dir and tsv_base_str:
+        header, rows = concordance_table(
+            matrix_view(views, zscore_out),
+            matrix_view(views, col_sum),
+            column_groups(source_col),
+            z_thresh=(
+                min(parse_thresh(exact_z_thresh)) if exact_z_thresh
+                else lower_z_thresh
+            ),
+            cs_thresh=min(parse_thresh(exact_cs_thresh))
+        )
+        write_concordance(
+            os.path.join(
+                pepsirf_tsv_dir,
+                "%s_replicate_concordance.tsv" % (tsv_base_str)
+            ),
+            header, rows
+        )
+
+    # count the enriched peptides of every replicate group over the whole
+    # zenrich threshold grid from the matrices already in memory
+    if zenrich_counts and pepsirf_tsv_dir and tsv_base_str:
+        labels, counts = grid_counts(
+            matrix_view(views, zscore_out),
+            matrix_view(views, col_sum),
+            column_groups(source_col),
+            z_grid(lower_z_thresh, upper_z_thresh, step_z_thresh),
+            exact_z_thresh=exact_zenrich_thresh,
+            exact_cs_thresh=exact_cs_thresh
+        )
+        write_grid_counts(
+            os.path.join(
+                pepsirf_tsv_dir, "%s_zenrich_counts.tsv" % (tsv_base_str)
+            ),
+            labels, counts
+        )
 
     # return all files created
     return (
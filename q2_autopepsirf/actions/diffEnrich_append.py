@@ -0,0 +1,296 @@
+from q2_pepsirf.format_types import (
+    PepsirfContingencyTSVFormat, ZscoreNanFormat, EnrichedPeptideDirFmt
+)
+from q2_autopepsirf.format_types import NegativeControlStatsFormat
+from q2_autopepsirf.utils.bitset import ENRICHED_SUFFIX
+from q2_autopepsirf.utils.export import enrich_base, export_view
+from q2_autopepsirf.utils.merge import (
+    merge_columns, merge_dirs, select_columns
+)
+from q2_autopepsirf.utils.negstats import stats_to_control
+from q2_autopepsirf.utils.source import (
+    column_groups, group_sources, split_groups, write_source_file
+)
+from q2_autopepsirf.utils.threads import ThreadBudget
+from q2_autopepsirf.utils.validate import read_samples
+from q2_autopepsirf.utils.views import ViewCache
+
+import os
+import qiime2
+
+# Name: diffEnrich_append
+# Process: adds newly sequenced samples to the outputs of a previous diffEnrich
+# run. Col-sum normalization, diff normalization against a fixed negative
+# control and z scores against fixed bins are per sample, so only the new
+# samples are run through pepsirf, and their outputs are merged with the
+# previous ones.
+# Method Input/Parameters: default ctx, raw_data (new samples only), bins,
+# col_sum, diff, diff_ratio, zscore, enrich (previous outputs),
+# negative_control, negative_stats, negative_id, negative_names, thresh_file,
+# exact_z_thresh, exact_cs_thresh, raw_constraint, hdi, source options,
+# view_cache_mb, export_compression, n_threads, pepsirf_binary
+# Method output/Returned: col_sum, diff, diff_ratio, zscore_out (merged),
+# nan_out (new samples), enrich_dir (merged)
+# Dependencies:
+# (pepsirf: norm, zscore, enrich)
+def diffEnrich_append(
+        ctx,
+        raw_data,
+        bins,
+        col_sum,
+        diff,
+        diff_ratio,
+        zscore,
+        enrich,
+        infer_pairs_source=True,
+        flexible_reps_source=False,
+        s_enrich_source=False,
+        user_defined_source=None,
+        negative_control=None,
+        negative_stats=None,
+        negative_id=None,
+        negative_names=None,
+        thresh_file=None,
+        exact_z_thresh=None,
+        exact_cs_thresh="20",
+        pepsirf_tsv_dir="./",
+        tsv_base_str=None,
+        raw_constraint=300000,
+        hdi=0.95,
+        view_cache_mb=1024,
+        export_compression=None,
+        n_threads=None,
+        pepsirf_binary="pepsirf"):
+
+    if (not negative_control and not negative_stats and not negative_id
+            and not negative_names):
+        raise ValueError(
+            "Appending samples requires the negative controls of the previous"
+            " run: provide negative-control, negative-stats, negative-id or"
+            " negative-names."
+        )
+    if negative_control and negative_stats:
+        raise ValueError(
+            "Provide either negative-control or negative-stats, not both."
+        )
+    if negative_stats and (negative_id or negative_names):
+        raise ValueError(
+            "negative-id and negative-names cannot be combined with"
+            " negative-stats."
+        )
+
+    if pepsirf_tsv_dir:
+        if not os.path.isdir(pepsirf_tsv_dir):
+            os.mkdir(pepsirf_tsv_dir)
+        if not tsv_base_str:
+            tsv_base_str = "aps-output"
+
+    budget = ThreadBudget(n_threads)
+    views = ViewCache(
+        max_bytes=view_cache_mb * 1024 * 1024, n_workers=budget.total
+    )
+    norm = ctx.get_action("pepsirf", "norm")
+    zscore_action = ctx.get_action("pepsirf", "zscore")
+    enrich_action = ctx.get_action("pepsirf", "enrich")
+
+    # replicates are only paired within a run, so a source with samples in
+    # both the previous run and the new samples would never be paired
+    prev_cs = str(views.view(col_sum, PepsirfContingencyTSVFormat))
+    previous = read_samples(prev_cs)
+    samples = read_samples(str(views.view(
+        raw_data, PepsirfContingencyTSVFormat
+    )))
+    if user_defined_source is not None:
+        split = split_groups(column_groups(user_defined_source), previous)
+    elif infer_pairs_source or flexible_reps_source:
+        split = split_groups(group_sources(previous + samples), previous)
+    else:
+        split = []
+    if split:
+        raise ValueError(
+            "Replicates of sources %s are split between the previous run and"
+            " the new samples. Rerun diffEnrich with all of their replicates"
+            " instead of appending." % (", ".join(map(str, split)))
+        )
+
+    # precomputed negative control statistics stand in for the negative
+    # control matrix, as in diffEnrich
+    if negative_stats:
+        neg_tsv = PepsirfContingencyTSVFormat()
+        stats_to_control(
+            str(views.view(negative_stats, NegativeControlStatsFormat)),
+            str(neg_tsv)
+        )
+        negative_control = ctx.make_artifact(
+            type="FeatureTable[Normed]",
+            view=neg_tsv,
+            view_type=PepsirfContingencyTSVFormat
+        )
+
+    # without a negative control matrix, the controls are the previous run's
+    # col-sum columns selected by name or id
+    if not negative_control:
+        if not negative_names:
+            negative_names = [
+                sample for sample in read_samples(prev_cs)
+                if sample.startswith(negative_id)
+            ]
+            if not negative_names:
+                raise ValueError(
+                    "No sample of the previous col-sum matrix starts with"
+                    " negative id '%s'." % (negative_id)
+                )
+        neg_tsv = PepsirfContingencyTSVFormat()
+        select_columns(prev_cs, negative_names, str(neg_tsv))
+        negative_control = ctx.make_artifact(
+            type="FeatureTable[Normed]",
+            view=neg_tsv,
+            view_type=PepsirfContingencyTSVFormat
+        )
+        negative_id = None
+        negative_names = None
+
+    # run norm module to recieve col-sum for the new samples
+    new_cs, = norm(
+        peptide_scores=raw_data,
+        normalize_approach="col_sum",
+        negative_control=None,
+        negative_id=None,
+        negative_names=None,
+        precision=2,
+        outfile=os.path.join(pepsirf_tsv_dir, "norm.out"),
+        pepsirf_binary=pepsirf_binary
+    )
+
+    # run norm module to recieve diff and diff-ratio for the new samples
+    new_diff, = norm(
+        peptide_scores=new_cs,
+        normalize_approach="diff",
+        negative_control=negative_control,
+        negative_id=negative_id,
+        negative_names=negative_names,
+        precision=2,
+        outfile=os.path.join(pepsirf_tsv_dir, "norm.out"),
+        pepsirf_binary=pepsirf_binary
+    )
+    new_diff_ratio, = norm(
+        peptide_scores=new_cs,
+        normalize_approach="diff_ratio",
+        negative_control=negative_control,
+        negative_id=negative_id,
+        negative_names=negative_names,
+        precision=2,
+        outfile=os.path.join(pepsirf_tsv_dir, "norm.out"),
+        pepsirf_binary=pepsirf_binary
+    )
+
+    # run zscore module to recieve z scores for the new samples
+    new_zscore, nan_out = zscore_action(
+        scores=new_diff,
+        bins=bins,
+        hdi=hdi,
+        # the single-threaded diff-ratio norm does not depend on zscore and
+        # can run alongside it
+        num_threads=budget.share(1, reserved=1),
+        outfile=os.path.join(pepsirf_tsv_dir, "zscore.out"),
+        pepsirf_binary=pepsirf_binary
+    )
+
+    # the source file only covers the new samples
+    if infer_pairs_source or flexible_reps_source or s_enrich_source:
+        source = os.path.join(pepsirf_tsv_dir, "samples_source_append.tsv")
+        write_source_file(
+            group_sources(samples), source,
+            flexible_reps_source=flexible_reps_source,
+            s_enrich_source=s_enrich_source,
+            infer_pairs_source=infer_pairs_source
+        )
+        source_col = qiime2.Metadata.load(source).get_column("source")
+    else:
+        source_col = user_defined_source
+
+    # run enrich module for the new samples
+    new_enrich, = enrich_action(
+        source=source_col,
+        flex_reps=flexible_reps_source,
+        thresh_file=thresh_file,
+        zscores=new_zscore,
+        col_sum=new_cs,
+        exact_z_thresh=exact_z_thresh,
+        exact_cs_thresh=exact_cs_thresh,
+        raw_scores=raw_data,
+        raw_constraint=raw_constraint,
+        enrichment_failure=True,
+        outfile=os.path.join(pepsirf_tsv_dir, "enrich.out"),
+        pepsirf_binary=pepsirf_binary
+    )
+
+    # merge the previous and new columns of every matrix
+    merged = []
+    for semantic_type, previous, new in (
+            ("FeatureTable[Normed]", col_sum, new_cs),
+            ("FeatureTable[NormedDifference]", diff, new_diff),
+            ("FeatureTable[NormedDiffRatio]", diff_ratio, new_diff_ratio),
+            ("FeatureTable[Zscore]", zscore, new_zscore)):
+        merged_tsv = PepsirfContingencyTSVFormat()
+        merge_columns(
+            [str(views.view(previous, PepsirfContingencyTSVFormat)),
+             str(views.view(new, PepsirfContingencyTSVFormat))],
+            str(merged_tsv)
+        )
+        merged.append(ctx.make_artifact(
+            type=semantic_type,
+            view=merged_tsv,
+            view_type=PepsirfContingencyTSVFormat
+        ))
+    col_sum, diff, diff_ratio, zscore_out = merged
+
+    merged_enrich = EnrichedPeptideDirFmt()
+    # an enriched peptide file found in both runs is an error, while the
+    # enrichment failure reports of both runs are concatenated
+    merge_dirs(
+        [str(views.view(enrich, EnrichedPeptideDirFmt).path),
+         str(views.view(new_enrich, EnrichedPeptideDirFmt).path)],
+        str(merged_enrich.path),
+        concat=lambda name: not name.endswith(ENRICHED_SUFFIX)
+    )
+    enrich_dir = ctx.make_artifact(
+        type="PairwiseEnrichment",
+        view=merged_enrich,
+        view_type=EnrichedPeptideDirFmt
+    )
+
+    # convert the updated outputs into tsvs and save them
+    if pepsirf_tsv_dir and tsv_base_str:
+        hdi_str = str(int(hdi * 100))
+        for artifact, base in (
+                (col_sum, "%s_CS.tsv" % (tsv_base_str)),
+                (diff, "%s_SBD.tsv" % (tsv_base_str)),
+                (diff_ratio, "%s_SBDR.tsv" % (tsv_base_str)),
+                (zscore_out, "%s_Z-HDI%s.tsv" % (tsv_base_str, hdi_str))):
+            export_view(
+                views.view(artifact, PepsirfContingencyTSVFormat),
+                os.path.join(pepsirf_tsv_dir, base), ext=".tsv",
+                compression=export_compression, n_threads=budget.total
+            )
+        export_view(
+            views.view(nan_out, ZscoreNanFormat),
+            os.path.join(
+                pepsirf_tsv_dir,
+                "%s_Z-HDI%s_append.nan" % (tsv_base_str, hdi_str)
+            ),
+            ext=".nan", compression=export_compression,
+            n_threads=budget.total
+        )
+        export_view(
+            views.view(enrich_dir, EnrichedPeptideDirFmt),
+            os.path.join(
+                pepsirf_tsv_dir,
+                enrich_base(
+                    exact_z_thresh, exact_cs_thresh, hdi, raw_constraint
+                )
+            ),
+            compression=export_compression, n_threads=budget.total
+        )
+
+    return col_sum, diff, diff_ratio, zscore_out, nan_out, enrich_dir
@@ -3,6 +3,11 @@ from q2_pepsirf.format_types import (
     PepsirfDMPFormat,
     PepsirfDeconvBatchDirFmt
 )
+from q2_autopepsirf.utils.export import export_view
+from q2_autopepsirf.utils.schedule import (
+    PEPSIRF_STEPS, niced_binary, step_nice
+)
+from q2_autopepsirf.utils.threads import ThreadBudget
 
 import os
 
@@ -20,6 +25,7 @@ def diffEnrich_deconv(
         s_enrich_source=False,
         user_defined_source = None,
         negative_control=None,
+        negative_stats=None,
         negative_id=None,
         negative_names=None,
         thresh_file=None,
@@ -39,10 +45,22 @@ def diffEnrich_deconv(
         id_name_map=None,
         single_threaded=False,
         remove_file_types=False,
+        view_cache_mb=1024,
+        export_compression=None,
+        columnar_export=False,
+        zenrich_counts=False,
+        scatter_grid_size=0,
+        scatter_outlier_thresh=10.0,
+        replicate_concordance=False,
+        defer_visualizations=False,
+        enrich_bitset=False,
+        n_threads=None,
+        step_priorities=None,
         pepsirf_binary="pepsirf"):
 
     diffEnrich = ctx.get_action("autopepsirf", "diffEnrich")
     deconv = ctx.get_action("pepsirf", "deconv_batch")
+    nice = step_nice(step_priorities, configurable=PEPSIRF_STEPS)
 
     (col_sum, diff, diff_ratio, zscore_out, nan_out, sample_names,
      read_counts, rc_boxplot_out, enrich_dir, enrichedCountsBoxplot, 
@@ -55,6 +73,7 @@ def diffEnrich_deconv(
         s_enrich_source=s_enrich_source,
         user_defined_source=user_defined_source,
         negative_control=negative_control,
+        negative_stats=negative_stats,
         negative_id=negative_id,
         negative_names=negative_names,
         thresh_file=thresh_file,
@@ -68,6 +87,17 @@ def diffEnrich_deconv(
         lower_z_thresh=lower_z_thresh,
         raw_constraint=raw_constraint,
         hdi=hdi,
+        step_priorities=step_priorities,
+        n_threads=n_threads,
+        enrich_bitset=enrich_bitset,
+        defer_visualizations=defer_visualizations,
+        replicate_concordance=replicate_concordance,
+        scatter_outlier_thresh=scatter_outlier_thresh,
+        scatter_grid_size=scatter_grid_size,
+        zenrich_counts=zenrich_counts,
+        columnar_export=columnar_export,
+        export_compression=export_compression,
+        view_cache_mb=view_cache_mb,
         pepsirf_binary=pepsirf_binary 
     )
 
@@ -82,16 +112,20 @@ def diffEnrich_deconv(
         score_tie_threshold=score_tie_threshold,
         score_overlap_threshold=score_overlap_threshold,
         id_name_map=id_name_map,
-        single_threaded=single_threaded,
+        single_threaded=single_threaded or n_threads == 1,
         remove_file_types=remove_file_types,
         outfile=os.path.join(pepsirf_tsv_dir, "deconv.out"),
-        pepsirf_binary=pepsirf_binary
+        pepsirf_binary=niced_binary(pepsirf_binary, nice["deconv"])
     )
 
     if pepsirf_tsv_dir and tsv_base_str:
         deconv_base = "%s_deconv_dir.tsv" % (tsv_base_str)
         deconv_tsv = dir_out.view(PepsirfDeconvBatchDirFmt)
-        deconv_tsv.save(os.path.join(pepsirf_tsv_dir, deconv_base), ext=".tsv")    
+        export_view(
+            deconv_tsv, os.path.join(pepsirf_tsv_dir, deconv_base),
+            ext=".tsv", compression=export_compression,
+            n_threads=ThreadBudget(n_threads).total
+        )
 
     return (
         dir_out, score_per_round, map_dir, col_sum, diff, diff_ratio, 
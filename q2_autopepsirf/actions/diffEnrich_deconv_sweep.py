@@ -0,0 +1,178 @@
+from itertools import product
+from q2_pepsirf.format_types import PepsirfDeconvBatchDirFmt
+from q2_autopepsirf.utils.export import export_view
+from q2_autopepsirf.utils.schedule import (
+    PEPSIRF_STEPS, niced_binary, step_nice
+)
+from q2_autopepsirf.utils.threads import ThreadBudget
+
+import os
+
+# Name: diffEnrich_deconv_sweep
+# Process: runs diffEnrich once, then runs pepsirf's deconv module for every
+# combination of the provided deconv parameters
+# Method Input/Parameters: default ctx, raw_data, bins, linked,
+# deconv_thresholds, scoring_strategies, score_tie_thresholds,
+# score_overlap_thresholds, mapfile_suffix, outfile_suffix, plus every
+# diffEnrich input/parameter
+# Method output/Returned: dir_out, score_per_round, map_dir (collections keyed
+# by parameter combination), col_sum, diff, diff_ratio, zscore_out, nan_out,
+# sample_names, read_counts, rc_boxplot_out, enrich_dir,
+# enrichedCountsBoxplot, zscore_scatter, colsum_scatter, zenrich_out
+# Dependencies:
+# (autopepsirf: diffEnrich), (pepsirf: deconv_batch)
+def diffEnrich_deconv_sweep(
+        ctx,
+        raw_data,
+        bins,
+        deconv_thresholds,
+        mapfile_suffix,
+        outfile_suffix,
+        linked,
+        scoring_strategies=None,
+        score_tie_thresholds=None,
+        score_overlap_thresholds=None,
+        infer_pairs_source=True,
+        flexible_reps_source=False,
+        s_enrich_source=False,
+        user_defined_source=None,
+        negative_control=None,
+        negative_stats=None,
+        negative_id=None,
+        negative_names=None,
+        thresh_file=None,
+        exact_z_thresh=None,
+        exact_cs_thresh="20",
+        exact_zenrich_thresh=None,
+        pepsirf_tsv_dir="./",
+        tsv_base_str=None,
+        step_z_thresh=5,
+        upper_z_thresh=30,
+        lower_z_thresh=5,
+        raw_constraint=300000,
+        hdi=0.95,
+        score_filtering=False,
+        id_name_map=None,
+        single_threaded=False,
+        remove_file_types=False,
+        view_cache_mb=1024,
+        export_compression=None,
+        columnar_export=False,
+        zenrich_counts=False,
+        scatter_grid_size=0,
+        scatter_outlier_thresh=10.0,
+        replicate_concordance=False,
+        defer_visualizations=False,
+        enrich_bitset=False,
+        n_threads=None,
+        step_priorities=None,
+        pepsirf_binary="pepsirf"):
+
+    # single values used by diffEnrich_deconv when a list is not provided
+    if not scoring_strategies:
+        scoring_strategies = ["summation"]
+    if not score_tie_thresholds:
+        score_tie_thresholds = [0.0]
+    if not score_overlap_thresholds:
+        score_overlap_thresholds = [0.0]
+
+    diffEnrich = ctx.get_action("autopepsirf", "diffEnrich")
+    deconv = ctx.get_action("pepsirf", "deconv_batch")
+    nice = step_nice(step_priorities, configurable=PEPSIRF_STEPS)
+
+    # the enrichment is shared by every combination, so it is only run once
+    (col_sum, diff, diff_ratio, zscore_out, nan_out, sample_names,
+     read_counts, rc_boxplot_out, enrich_dir, enrichedCountsBoxplot,
+     zscore_scatter, colsum_scatter, zenrich_out
+     ) = diffEnrich(
+        raw_data=raw_data,
+        bins=bins,
+        infer_pairs_source=infer_pairs_source,
+        flexible_reps_source=flexible_reps_source,
+        s_enrich_source=s_enrich_source,
+        user_defined_source=user_defined_source,
+        negative_control=negative_control,
+        negative_stats=negative_stats,
+        negative_id=negative_id,
+        negative_names=negative_names,
+        thresh_file=thresh_file,
+        exact_z_thresh=exact_z_thresh,
+        exact_cs_thresh=exact_cs_thresh,
+        exact_zenrich_thresh=exact_zenrich_thresh,
+        pepsirf_tsv_dir=pepsirf_tsv_dir,
+        tsv_base_str=tsv_base_str,
+        step_z_thresh=step_z_thresh,
+        upper_z_thresh=upper_z_thresh,
+        lower_z_thresh=lower_z_thresh,
+        raw_constraint=raw_constraint,
+        hdi=hdi,
+        step_priorities=step_priorities,
+        n_threads=n_threads,
+        enrich_bitset=enrich_bitset,
+        defer_visualizations=defer_visualizations,
+        replicate_concordance=replicate_concordance,
+        scatter_outlier_thresh=scatter_outlier_thresh,
+        scatter_grid_size=scatter_grid_size,
+        zenrich_counts=zenrich_counts,
+        columnar_export=columnar_export,
+        export_compression=export_compression,
+        view_cache_mb=view_cache_mb,
+        pepsirf_binary=pepsirf_binary
+    )
+
+    # launch every deconv run before viewing any result, so when the pipeline
+    # is run with qiime2's parallel executor the grid runs concurrently. A
+    # thread budget set with n_threads is split between the concurrent runs,
+    # so each one runs single-threaded once the grid is as large as the
+    # budget. Without one, deconv keeps its own default as in
+    # diffEnrich_deconv.
+    n_runs = (len(deconv_thresholds) * len(scoring_strategies)
+              * len(score_tie_thresholds) * len(score_overlap_thresholds))
+    run_threads = ThreadBudget(n_threads).share(n_runs)
+    single_threaded = single_threaded or (
+        n_threads is not None and run_threads == 1
+    )
+    dir_outs = {}
+    score_per_rounds = {}
+    map_dirs = {}
+    for threshold, strategy, tie, overlap in product(
+            deconv_thresholds, scoring_strategies,
+            score_tie_thresholds, score_overlap_thresholds):
+        key = "%s_%s_%s_%s" % (threshold, strategy, tie, overlap)
+
+        # each run gets its own log so concurrent runs do not share a file
+        (dir_outs[key], score_per_rounds[key], map_dirs[key]) = deconv(
+            enriched_dir=enrich_dir,
+            threshold=threshold,
+            mapfile_suffix=mapfile_suffix,
+            outfile_suffix=outfile_suffix,
+            linked=linked,
+            scoring_strategy=strategy,
+            score_filtering=score_filtering,
+            score_tie_threshold=tie,
+            score_overlap_threshold=overlap,
+            id_name_map=id_name_map,
+            single_threaded=single_threaded,
+            remove_file_types=remove_file_types,
+            outfile=os.path.join(pepsirf_tsv_dir, "deconv_%s.out" % (key)),
+            pepsirf_binary=niced_binary(pepsirf_binary, nice["deconv"])
+        )
+
+    # convert the qza outputs into tsvs and save them. Exports start while
+    # other runs are still going, so they get the share of one run.
+    if pepsirf_tsv_dir and tsv_base_str:
+        for key, dir_out in dir_outs.items():
+            deconv_base = "%s_deconv_%s_dir.tsv" % (tsv_base_str, key)
+            deconv_tsv = dir_out.view(PepsirfDeconvBatchDirFmt)
+            export_view(
+                deconv_tsv, os.path.join(pepsirf_tsv_dir, deconv_base),
+                ext=".tsv", compression=export_compression,
+                n_threads=run_threads
+            )
+
+    return (
+        dir_outs, score_per_rounds, map_dirs, col_sum, diff, diff_ratio,
+        zscore_out, nan_out, sample_names, read_counts, rc_boxplot_out,
+        enrich_dir, enrichedCountsBoxplot, zscore_scatter, colsum_scatter,
+        zenrich_out
+    )
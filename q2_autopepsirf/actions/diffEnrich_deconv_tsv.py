@@ -5,6 +5,7 @@ from q2_pepsirf.format_types import (
     PepsirfLinkTSVFormat,
     PepsirfDMPFormat
 )
+from q2_autopepsirf.utils.ingest import import_tsv
 
 def diffEnrich_deconv_tsv(
         ctx,
@@ -39,26 +40,31 @@ def diffEnrich_deconv_tsv(
         score_overlap_threshold=0.0,
         single_threaded=False,
         remove_file_types=False,
+        view_cache_mb=1024,
+        export_compression=None,
+        columnar_export=False,
+        zenrich_counts=False,
+        scatter_grid_size=0,
+        scatter_outlier_thresh=10.0,
+        replicate_concordance=False,
+        defer_visualizations=False,
+        enrich_bitset=False,
+        n_threads=None,
+        step_priorities=None,
         pepsirf_binary="pepsirf"):
 
     diffEnrich_deconv = ctx.get_action("autopepsirf", "diffEnrich_deconv")
-    raw_data = ctx.make_artifact(
-        type="FeatureTable[RawCounts]",
-        view=raw_data_tsv,
-        view_type=PepsirfContingencyTSVFormat
+    raw_data = import_tsv(
+        ctx, "FeatureTable[RawCounts]", raw_data_tsv,
+        PepsirfContingencyTSVFormat, min_fields=2
     )
 
-    bins = ctx.make_artifact(
-        type="PeptideBins",
-        view=bins_tsv,
-        view_type=PeptideBinFormat
-    )
+    bins = import_tsv(ctx, "PeptideBins", bins_tsv, PeptideBinFormat)
 
     if negative_control_tsv:
-        negative_control = ctx.make_artifact(
-            type="FeatureTable[Normed]",
-            view=negative_control_tsv,
-            view_type=PepsirfContingencyTSVFormat
+        negative_control = import_tsv(
+            ctx, "FeatureTable[Normed]", negative_control_tsv,
+            PepsirfContingencyTSVFormat, min_fields=2
         )
     # otherwise set negative control to none
     else:
@@ -66,39 +72,35 @@ def diffEnrich_deconv_tsv(
     
     #if thresh-file provided import into artifact
     if thresh_file_tsv:
-        thresh_file = ctx.make_artifact(
-            type="EnrichThresh",
-            view=thresh_file_tsv,
-            view_type=EnrichThreshFileFormat
+        thresh_file = import_tsv(
+            ctx, "EnrichThresh", thresh_file_tsv,
+            EnrichThreshFileFormat, min_fields=2
         )
     #otherwise set thresh-file to none
     else:
         thresh_file = None
 
-    linked = ctx.make_artifact(
-        type="Link",
-        view=linked_tsv,
-        view_type=PepsirfLinkTSVFormat
+    linked = import_tsv(
+        ctx, "Link", linked_tsv, PepsirfLinkTSVFormat, min_fields=2
     )
 
     if id_name_map_tsv:
-        id_name_map = ctx.make_artifact(
-            type="PepsirfDMP",
-            view=id_name_map_tsv,
-            view_type=PepsirfDMPFormat
+        id_name_map = import_tsv(
+            ctx, "PepsirfDMP", id_name_map_tsv, PepsirfDMPFormat,
+            min_fields=2
         )
     else:
         id_name_map = None
 
     
 
-    (col_sum, diff, diff_ratio, zscore_out, nan_out, sample_names, read_counts,
-     rc_boxplot_out, enrich_dir, enrichedCountsBoxplot, zscore_scatter,
-     colsum_scatter, zenrich_out, dir_out, score_per_round, map_dir
+    (dir_out, score_per_round, map_dir, col_sum, diff, diff_ratio, zscore_out,
+     nan_out, sample_names, read_counts, rc_boxplot_out, enrich_dir,
+     enrichedCountsBoxplot, zscore_scatter, colsum_scatter, zenrich_out
      ) = diffEnrich_deconv(
         raw_data=raw_data,
         bins=bins,
-        threshold=threshold_deconv,
+        deconv_threshold=deconv_threshold,
         mapfile_suffix=mapfile_suffix,
         outfile_suffix=outfile_suffix,
         linked=linked,
@@ -120,12 +122,23 @@ def diffEnrich_deconv_tsv(
         lower_z_thresh=lower_z_thresh,
         raw_constraint=raw_constraint,
         hdi=hdi,
+        step_priorities=step_priorities,
+        n_threads=n_threads,
+        enrich_bitset=enrich_bitset,
+        defer_visualizations=defer_visualizations,
+        replicate_concordance=replicate_concordance,
+        scatter_outlier_thresh=scatter_outlier_thresh,
+        scatter_grid_size=scatter_grid_size,
+        zenrich_counts=zenrich_counts,
+        columnar_export=columnar_export,
+        export_compression=export_compression,
+        view_cache_mb=view_cache_mb,
         scoring_strategy=scoring_strategy,
         score_filtering=score_filtering,
         score_tie_threshold=score_tie_threshold,
         score_overlap_threshold=score_overlap_threshold,
         id_name_map=id_name_map,
-        single_threaded=single_threaded,
+        single_threaded=single_threaded or n_threads == 1,
         remove_file_types=remove_file_types,
         pepsirf_binary=pepsirf_binary
     )
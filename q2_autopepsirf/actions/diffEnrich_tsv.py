@@ -4,6 +4,7 @@ from q2_pepsirf.format_types import (
     PepsirfContingencyTSVFormat, ZscoreNanFormat, EnrichedPeptideDirFmt,
     PeptideBinFormat, EnrichThreshFileFormat
 )
+from q2_autopepsirf.utils.ingest import import_tsv
 
 import csv
 import os
@@ -44,31 +45,36 @@ def diffEnrich_tsv(
         lower_z_thresh=5,
         raw_constraint=300000,
         hdi=0.95,
+        view_cache_mb=1024,
+        export_compression=None,
+        columnar_export=False,
+        zenrich_counts=False,
+        scatter_grid_size=0,
+        scatter_outlier_thresh=10.0,
+        replicate_concordance=False,
+        defer_visualizations=False,
+        enrich_bitset=False,
+        n_threads=None,
+        step_priorities=None,
         pepsirf_binary="pepsirf"):
 
     # collect diffEnrich action
     diffEnrich = ctx.get_action("autopepsirf", "diffEnrich")
 
     # import raw data into an artifact
-    raw_data = ctx.make_artifact(
-        type="FeatureTable[RawCounts]",
-        view=raw_data_filepath,
-        view_type=PepsirfContingencyTSVFormat
+    raw_data = import_tsv(
+        ctx, "FeatureTable[RawCounts]", raw_data_filepath,
+        PepsirfContingencyTSVFormat, min_fields=2
     )
 
     # import bins into an artifact
-    bins = ctx.make_artifact(
-        type="PeptideBins",
-        view=bins_filepath,
-        view_type=PeptideBinFormat
-    )
+    bins = import_tsv(ctx, "PeptideBins", bins_filepath, PeptideBinFormat)
 
     # if negative_control provided import into artifact
     if negative_control_filepath:
-        negative_control = ctx.make_artifact(
-            type="FeatureTable[Normed]",
-            view=negative_control_filepath,
-            view_type=PepsirfContingencyTSVFormat
+        negative_control = import_tsv(
+            ctx, "FeatureTable[Normed]", negative_control_filepath,
+            PepsirfContingencyTSVFormat, min_fields=2
         )
     # otherwise set negative control to none
     else:
@@ -76,10 +82,9 @@ def diffEnrich_tsv(
     
     #if thresh-file provided import into artifact
     if thresh_file_filepath:
-        thresh_file = ctx.make_artifact(
-            type="EnrichThresh",
-            view=thresh_file_filepath,
-            view_type=EnrichThreshFileFormat
+        thresh_file = import_tsv(
+            ctx, "EnrichThresh", thresh_file_filepath,
+            EnrichThreshFileFormat, min_fields=2
         )
     #otherwise set thresh-file to none
     else:
@@ -110,6 +115,17 @@ def diffEnrich_tsv(
         lower_z_thresh=lower_z_thresh,
         raw_constraint=raw_constraint,
         hdi=hdi,
+        step_priorities=step_priorities,
+        n_threads=n_threads,
+        enrich_bitset=enrich_bitset,
+        defer_visualizations=defer_visualizations,
+        replicate_concordance=replicate_concordance,
+        scatter_outlier_thresh=scatter_outlier_thresh,
+        scatter_grid_size=scatter_grid_size,
+        zenrich_counts=zenrich_counts,
+        columnar_export=columnar_export,
+        export_compression=export_compression,
+        view_cache_mb=view_cache_mb,
         pepsirf_binary=pepsirf_binary 
     )
 
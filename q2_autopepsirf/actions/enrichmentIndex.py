@@ -0,0 +1,39 @@
+from q2_pepsirf.format_types import EnrichedPeptideDirFmt
+from q2_autopepsirf.utils.bitset import read_enriched_dir
+from q2_autopepsirf.utils.db import add_enriched, connect
+
+import html
+import os
+
+# Name: enrichmentIndex
+# Process: adds the enrichment results of a run to a persistent inverted index
+# (SQLite) from peptide to the (run, sample) pairs it was enriched in. Runs
+# are added incrementally, adding a run again replaces it. Lookups go through
+# q2_autopepsirf.utils.db.lookup_peptide and lookup_sample.
+# Method Input/Parameters: output_dir, enrich, index_path, run_name
+# Method output/Returned: None
+def enrichmentIndex(
+        output_dir: str,
+        enrich: EnrichedPeptideDirFmt,
+        index_path: str,
+        run_name: str) -> None:
+
+    enriched = read_enriched_dir(str(enrich.path))
+    conn = connect(index_path)
+    try:
+        added = add_enriched(conn, run_name, enriched)
+        runs, postings = conn.execute(
+            "SELECT (SELECT COUNT(*) FROM runs),"
+            " (SELECT COUNT(*) FROM enriched)"
+        ).fetchone()
+    finally:
+        conn.close()
+
+    with open(os.path.join(output_dir, "index.html"), "w") as fh:
+        fh.write(
+            "<html><body><h2>Enrichment index</h2>"
+            "<p>Added run %s: %d samples, %d postings.</p>"
+            "<p>%s now holds %d runs and %d postings.</p></body></html>\n"
+            % (html.escape(run_name), len(enriched), added,
+               html.escape(os.path.abspath(index_path)), runs, postings)
+        )
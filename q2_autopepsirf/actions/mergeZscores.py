@@ -0,0 +1,24 @@
+from q2_pepsirf.format_types import PepsirfContingencyTSVFormat
+from q2_autopepsirf.utils.merge import kway_merge
+
+import tempfile
+
+# Name: mergeZscores
+# Process: joins the z score matrices of many diffEnrich runs on peptide in
+# bounded memory. Matrices that are not sorted by peptide are sorted
+# externally, then all of them are streamed through a k-way merge. Peptides
+# missing from a run are written as nan.
+# Method Input/Parameters: zscores (list of matrices), chunk_rows
+# Method output/Returned: PepsirfContingencyTSVFormat
+def mergeZscores(
+        zscores: PepsirfContingencyTSVFormat,
+        chunk_rows: int = 1000000) -> PepsirfContingencyTSVFormat:
+
+    merged = PepsirfContingencyTSVFormat()
+    # sorted runs are written next to the output, in qiime2's temp directory
+    with tempfile.TemporaryDirectory(dir=str(merged.path.parent)) as tmpdir:
+        kway_merge(
+            [str(matrix) for matrix in zscores], str(merged),
+            chunk_rows=chunk_rows, tmpdir=tmpdir
+        )
+    return merged
@@ -0,0 +1,34 @@
+from q2_pepsirf.format_types import PepsirfContingencyTSVFormat
+from q2_autopepsirf.format_types import NegativeControlStatsFormat
+from q2_autopepsirf.utils.negstats import (
+    select_controls, summarize, write_stats
+)
+
+import pandas as pd
+
+# Name: negativeControlStats
+# Process: computes per-peptide mean, count and variance of a set of negative
+# control samples once, so the result can be reused by diffEnrich on every
+# plate that shares those controls
+# Method Input/Parameters: negative_control, negative_id, negative_names
+# Method output/Returned: NegativeControlStatsFormat
+def negativeControlStats(
+        negative_control: PepsirfContingencyTSVFormat,
+        negative_id: str = None,
+        negative_names: list = None) -> NegativeControlStatsFormat:
+
+    path = str(negative_control)
+    with open(path) as fh:
+        header = fh.readline().rstrip("\r\n").split("\t")
+    samples = select_controls(header, negative_id, negative_names, path)
+
+    # only the selected columns are parsed
+    frame = pd.read_csv(
+        path, sep="\t", index_col=0, usecols=[header[0]] + samples
+    )
+    frame.index = frame.index.astype(str)
+    count, mean, variance = summarize(frame[samples].to_numpy())
+
+    stats = NegativeControlStatsFormat()
+    write_stats(str(stats), frame.index, mean, count, variance)
+    return stats
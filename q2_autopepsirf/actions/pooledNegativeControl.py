@@ -0,0 +1,29 @@
+from q2_pepsirf.format_types import PepsirfContingencyTSVFormat
+from q2_autopepsirf.format_types import NegativeControlStatsFormat
+from q2_autopepsirf.utils.negstats import pool_stats, write_stats
+
+# Name: pooledNegativeControl
+# Process: pools the negative controls of many plates without building one
+# combined matrix. The matrices are streamed one at a time and per-peptide
+# mean and variance are kept as running statistics, so memory is bounded by
+# the number of peptides.
+# Method Input/Parameters: negative_controls (list of matrices), negative_id,
+# negative_names, chunk_rows
+# Method output/Returned: NegativeControlStatsFormat
+def pooledNegativeControl(
+        negative_controls: PepsirfContingencyTSVFormat,
+        negative_id: str = None,
+        negative_names: list = None,
+        chunk_rows: int = 50000) -> NegativeControlStatsFormat:
+
+    stats = pool_stats(
+        [str(matrix) for matrix in negative_controls],
+        negative_id=negative_id,
+        negative_names=negative_names,
+        chunksize=chunk_rows
+    )
+    count, mean, variance = stats.result()
+
+    out = NegativeControlStatsFormat()
+    write_stats(str(out), stats.peptides, mean, count, variance)
+    return out
@@ -0,0 +1,107 @@
+from q2_pepsirf.format_types import (
+    PepsirfContingencyTSVFormat, PepsirfInfoSumOfProbesFmt,
+    EnrichedPeptideDirFmt
+)
+from q2_autopepsirf.utils.deferred import read_render_data
+from q2_autopepsirf.utils.ingest import import_tsv
+from q2_autopepsirf.utils.merge import merge_dirs
+
+import qiime2
+
+# Name: renderVisualizations
+# Process: builds the visualizations of a diffEnrich run made with
+# defer_visualizations from its run directory. The render data is imported
+# once and every ps-plot action is issued before any result is used, so
+# qiime2's parallel pipeline executor renders them concurrently.
+# Method Input/Parameters: default ctx, run_dir, pepsirf_binary (defaults to
+# the one used by the run)
+# Method output/Returned: rc_boxplot, enrich_count_boxplot, zscore_scatter,
+# colsum_scatter, zenrich_scatter
+# Dependencies:
+# (ps-plot: readCountsBoxplot, enrichmentRCBoxplot, repScatters, zenrich)
+def renderVisualizations(
+        ctx,
+        run_dir,
+        pepsirf_binary=None):
+
+    files, params = read_render_data(run_dir)
+
+    # collect the actions from ps-plot to be executed
+    RCBoxplot = ctx.get_action("ps-plot", "readCountsBoxplot")
+    enrichBoxplot = ctx.get_action("ps-plot", "enrichmentRCBoxplot")
+    repScatter = ctx.get_action("ps-plot", "repScatters")
+    zenrich = ctx.get_action("ps-plot", "zenrich")
+
+    # import the stored render data
+    matrices = {}
+    for name, semantic_type in (
+            ("col_sum.tsv", "FeatureTable[Normed]"),
+            ("zscore.tsv", "FeatureTable[Zscore]"),
+            ("colsum_plot.tsv", "FeatureTable[Normed]"),
+            ("zscore_plot.tsv", "FeatureTable[Zscore]"),
+            ("negative_control.tsv", "FeatureTable[Normed]")):
+        if name in files:
+            matrices[name] = import_tsv(
+                ctx, semantic_type, files[name], PepsirfContingencyTSVFormat,
+                min_fields=2
+            )
+    read_counts = import_tsv(
+        ctx, "InfoSumOfProbes", files["read_counts.tsv"],
+        PepsirfInfoSumOfProbesFmt, min_fields=2
+    )
+    enriched = EnrichedPeptideDirFmt()
+    merge_dirs([files["enriched"]], str(enriched.path))
+    enrich_dir = ctx.make_artifact(
+        type="PairwiseEnrichment",
+        view=enriched,
+        view_type=EnrichedPeptideDirFmt
+    )
+    source_col = qiime2.Metadata.load(
+        files["source.tsv"]
+    ).get_column("source")
+
+    # run readCounts boxplot module to recieve visualization
+    rc_boxplot_out, = RCBoxplot(
+        read_counts=read_counts, png_out_dir=params["png_out_dir"]
+    )
+
+    # run enrichment boxplot module to recieve visualization
+    enrichedCountsBoxplot, = enrichBoxplot(
+        enriched_dir=enrich_dir, png_out_dir=params["png_out_dir"]
+    )
+
+    # run repScatter module to collect visualization
+    zscore_scatter, = repScatter(
+        source=source_col,
+        plot_log=False,
+        zscore=matrices["zscore_plot.tsv"]
+    )
+
+    # run repScatter module to collect visualization
+    colsum_scatter, = repScatter(
+        source=source_col,
+        plot_log=True,
+        col_sum=matrices["colsum_plot.tsv"]
+    )
+
+    # run the zenrich module to collect visualization
+    zenrich_out, = zenrich(
+        data=matrices["col_sum.tsv"],
+        zscores=matrices["zscore.tsv"],
+        flex_reps=params["flexible_reps_source"],
+        negative_controls=params["negative_names"],
+        negative_id=params["negative_id"],
+        source=source_col,
+        negative_data=matrices.get("negative_control.tsv"),
+        step_z_thresh=params["step_z_thresh"],
+        upper_z_thresh=params["upper_z_thresh"],
+        lower_z_thresh=params["lower_z_thresh"],
+        exact_z_thresh=params["exact_zenrich_thresh"],
+        exact_cs_thresh=params["exact_cs_thresh"],
+        pepsirf_binary=pepsirf_binary or params["pepsirf_binary"]
+    )
+
+    return (
+        rc_boxplot_out, enrichedCountsBoxplot, zscore_scatter,
+        colsum_scatter, zenrich_out
+    )
@@ -0,0 +1,57 @@
+from q2_pepsirf.format_types import (
+    PepsirfContingencyTSVFormat, EnrichedPeptideDirFmt
+)
+from q2_autopepsirf.utils.bitset import read_enriched_dir
+from q2_autopepsirf.utils.db import connect, ingest_run
+from q2_autopepsirf.utils.matrix import PeptideMatrix
+from q2_autopepsirf.utils.threads import available_cpus
+
+import html
+import numpy as np
+import os
+
+# Name: warehouseIngest
+# Process: adds the col-sum and z scores and the enriched peptides of a run
+# to a local SQLite results warehouse keyed by run, sample and peptide, so
+# per-peptide and per-sample queries across runs do not reload tsvs. Queries
+# go through q2_autopepsirf.utils.db.peptide_scores, sample_scores,
+# lookup_peptide and lookup_sample. Ingesting a run name again replaces it.
+# Method Input/Parameters: output_dir, col_sum, zscore, enrich,
+# warehouse_path, run_name
+# Method output/Returned: None
+def warehouseIngest(
+        output_dir: str,
+        col_sum: PepsirfContingencyTSVFormat,
+        zscore: PepsirfContingencyTSVFormat,
+        enrich: EnrichedPeptideDirFmt,
+        warehouse_path: str,
+        run_name: str) -> None:
+
+    n_workers = available_cpus()
+    col_sum_matrix = PeptideMatrix.from_tsv(
+        str(col_sum), dtype=np.float64, n_workers=n_workers
+    )
+    zscore_matrix = PeptideMatrix.from_tsv(
+        str(zscore), dtype=np.float64, n_workers=n_workers
+    )
+    enriched = read_enriched_dir(str(enrich.path))
+
+    conn = connect(warehouse_path)
+    try:
+        n_scores, n_enriched = ingest_run(
+            conn, run_name, col_sum_matrix, zscore_matrix, enriched
+        )
+        runs, = conn.execute("SELECT COUNT(*) FROM runs").fetchone()
+    finally:
+        conn.close()
+
+    with open(os.path.join(output_dir, "index.html"), "w") as fh:
+        fh.write(
+            "<html><body><h2>Results warehouse</h2>"
+            "<p>Ingested run %s: %d samples x %d peptides (%d scores), %d"
+            " enriched peptides.</p><p>%s now holds %d runs.</p>"
+            "</body></html>\n"
+            % (html.escape(run_name), len(zscore_matrix.samples),
+               len(zscore_matrix.peptides), n_scores, n_enriched,
+               html.escape(os.path.abspath(warehouse_path)), runs)
+        )
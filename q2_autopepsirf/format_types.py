@@ -0,0 +1,38 @@
+from qiime2.plugin import SemanticType, ValidationError, model
+
+# per-peptide summary statistics of a set of negative controls
+NegativeControlStats = SemanticType("NegativeControlStats")
+
+NEGATIVE_STATS_COLUMNS = ["mean", "count", "variance"]
+
+
+class NegativeControlStatsFormat(model.TextFileFormat):
+    def _validate_(self, level):
+        limit = 10 if level == "min" else None
+        with self.open() as fh:
+            header = fh.readline().rstrip("\r\n").split("\t")
+            if header[1:] != NEGATIVE_STATS_COLUMNS:
+                raise ValidationError(
+                    "Expected a peptide column followed by the columns %s,"
+                    " found: %s" % (", ".join(NEGATIVE_STATS_COLUMNS),
+                                    ", ".join(header))
+                )
+            for lineno, line in enumerate(fh, 2):
+                if limit is not None and lineno > limit + 1:
+                    break
+                fields = line.rstrip("\r\n").split("\t")
+                try:
+                    if len(fields) != 4:
+                        raise ValueError
+                    [float(field) for field in fields[1:]]
+                except ValueError:
+                    raise ValidationError(
+                        "Line %d is not a peptide followed by three numbers:"
+                        " %s" % (lineno, line.strip())
+                    )
+
+
+NegativeControlStatsDirFmt = model.SingleFileDirectoryFormat(
+    "NegativeControlStatsDirFmt", "negative-control-stats.tsv",
+    NegativeControlStatsFormat
+)
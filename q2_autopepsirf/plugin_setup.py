@@ -2,11 +2,27 @@ from q2_autopepsirf.actions.diffEnrich import diffEnrich
 from q2_autopepsirf.actions.diffEnrich_tsv import diffEnrich_tsv
 from q2_autopepsirf.actions.diffEnrich_deconv import diffEnrich_deconv
 from q2_autopepsirf.actions.diffEnrich_deconv_tsv import diffEnrich_deconv_tsv
+from q2_autopepsirf.actions.diffEnrich_deconv_sweep import (
+    diffEnrich_deconv_sweep
+)
+from q2_autopepsirf.actions.diffEnrich_append import diffEnrich_append
+from q2_autopepsirf.actions.negativeControlStats import negativeControlStats
+from q2_autopepsirf.actions.pooledNegativeControl import pooledNegativeControl
+from q2_autopepsirf.actions.deferredVisualization import deferredVisualization
+from q2_autopepsirf.actions.renderVisualizations import renderVisualizations
+from q2_autopepsirf.actions.enrichmentIndex import enrichmentIndex
+from q2_autopepsirf.actions.warehouseIngest import warehouseIngest
+from q2_autopepsirf.actions.mergeZscores import mergeZscores
+from q2_autopepsirf.utils.deferred import VISUALIZATIONS
+from q2_autopepsirf.format_types import (
+    NegativeControlStats, NegativeControlStatsFormat,
+    NegativeControlStatsDirFmt
+)
 from q2_types.feature_table import FeatureTable
 from qiime2.plugin import (
     Plugin, TypeMap, Str, List, MetadataColumn,
     Categorical, Int, Range, Visualization, Float,
-    Bool
+    Bool, Collection, Choices
 )
 from q2_pepsirf.format_types import (
     RawCounts, Normed, NormedDifference,
@@ -30,6 +46,12 @@ plugin = Plugin(
     description="Qiime2 plugin used for the automation of q2-pepsirf and q2-ps-plot."
 )
 
+plugin.register_formats(NegativeControlStatsFormat, NegativeControlStatsDirFmt)
+plugin.register_semantic_types(NegativeControlStats)
+plugin.register_semantic_type_to_format(
+    NegativeControlStats, artifact_format=NegativeControlStatsDirFmt
+)
+
 # shared outputs for diffEnrich and diffEnrich tsv pipeline
 shared_outputs = [
     ("col_sum", FeatureTable[Normed]),
@@ -65,7 +87,18 @@ shared_parameters = {
     "infer_pairs_source": Bool,
     "flexible_reps_source": Bool,
     "s_enrich_source": Bool,
-    "user_defined_source": MetadataColumn[Categorical]
+    "user_defined_source": MetadataColumn[Categorical],
+    "view_cache_mb": Int % Range(0, None),
+    "export_compression": Str % Choices("gzip", "bz2", "xz"),
+    "columnar_export": Bool,
+    "zenrich_counts": Bool,
+    "replicate_concordance": Bool,
+    "scatter_grid_size": Int % Range(0, None),
+    "scatter_outlier_thresh": Float,
+    "defer_visualizations": Bool,
+    "enrich_bitset": Bool,
+    "n_threads": Int % Range(1, None),
+    "step_priorities": List[Str]
 }
 
 # shared parameter descriptions for diffEnrich and diffEnrich tsv pipeline
@@ -122,7 +155,68 @@ shared_parameter_description = {
         " with only one replicate",
     "user_defined_source": "Metadata file containing all sample names and"
         " their source groups. Used to create pairs tsv to run pepsirf enrich"
-        " module."
+        " module.",
+    "view_cache_mb": "Memory budget in megabytes for artifact views that are"
+        " reused across pipeline steps. Least recently used views are dropped"
+        " once the budget is exceeded, except the two most recently used, so"
+        " the budget is a soft limit.",
+    "export_compression": "Compress the tsv files written to pepsirf-tsv-dir"
+        " with gzip, bz2 or xz. Files are compressed in parallel blocks"
+        " directly from the artifact data, and the compression extension is"
+        " appended to each file name.",
+    "columnar_export": "Also write the col-sum and z score matrices to"
+        " pepsirf-tsv-dir in a columnar binary format (parquet when pyarrow is"
+        " installed, otherwise a directory with a column-major .npy matrix and"
+        " its peptide/sample indexes). Load them with"
+        " q2_autopepsirf.utils.columnar.read_columnar, which reads only the"
+        " requested samples.",
+    "zenrich_counts": "Also write the number of enriched peptides of every"
+        " replicate group at every zenrich z score threshold (the"
+        " lower/upper/step grid and exact-zenrich-thresh) to"
+        " pepsirf-tsv-dir as <tsv-base-str>_zenrich_counts.tsv. Counts are"
+        " computed in-process from the z score and col-sum matrices.",
+    "replicate_concordance": "Also write a per replicate pair QC table to"
+        " pepsirf-tsv-dir as <tsv-base-str>_replicate_concordance.tsv, with"
+        " Pearson and Spearman correlation, the fraction of peptides at or"
+        " above threshold in both replicates and a reduced major axis slope,"
+        " for the z scores and for log10 col-sum. The z threshold is the lower"
+        " exact-z-thresh value (lower-z-thresh when not set) and the col-sum"
+        " threshold the lower exact-cs-thresh value.",
+    "scatter_grid_size": "When greater than 0, the replicate scatter plots"
+        " are built from one peptide per occupied cell of a"
+        " scatter-grid-size x scatter-grid-size grid over every replicate"
+        " pair instead of from every peptide, so their size depends on the"
+        " grid resolution rather than the number of peptides. 0 plots every"
+        " peptide.",
+    "scatter_outlier_thresh": "With scatter-grid-size, peptides with a z"
+        " score at or above this value in any sample are always plotted"
+        " exactly in both scatter plots.",
+    "defer_visualizations": "Do not render the boxplots, scatters and"
+        " zenrich plot. The data they are built from is linked into"
+        " <pepsirf-tsv-dir>/<tsv-base-str>_render with a manifest, and"
+        " placeholder visualizations pointing to it are returned. Build the"
+        " real visualizations later with render-visualizations.",
+    "enrich_bitset": "Also write the enriched peptides of every sample as a"
+        " bit-packed samples x peptides matrix to pepsirf-tsv-dir as"
+        " <tsv-base-str>_enriched_bits.npz (bits, samples and peptides"
+        " arrays). Load it with"
+        " q2_autopepsirf.utils.bitset.EnrichmentBitset.load for enriched"
+        " counts, unions and intersections across samples.",
+    "n_threads": "Number of threads the pipeline may use, every core the"
+        " process may run on (its CPU affinity) when not set. It is split"
+        " between the steps that can run at the same time with qiime2's"
+        " --parallel option and passed to the pepsirf zscore and deconv"
+        " steps (deconv runs single threaded when its share is one thread),"
+        " and to the in-process parsing workers.",
+    "step_priorities": "Nice values of the pepsirf steps as step=nice"
+        " entries (Ex: diff_ratio=15). Steps are col_sum, diff, diff_ratio,"
+        " zscore, sample_names, read_counts, enrich and deconv. By default"
+        " steps on the critical path of the run (col_sum, diff, zscore,"
+        " enrich, deconv) get 0 and the others 10, so when steps run at the"
+        " same time (Ex: with qiime2's --parallel option) the critical path"
+        " gets the cores first. Each pepsirf process is started at its"
+        " step's nice value. Visualizations run in the pipeline's process at"
+        " its priority."
 }
 
 # action set up for diffEnrich module
@@ -131,6 +225,7 @@ plugin.pipelines.register_function(
     inputs={
         "raw_data": FeatureTable[RawCounts],
         "negative_control": FeatureTable[Normed],
+        "negative_stats": NegativeControlStats,
         "bins": PeptideBins,
         "thresh_file": EnrichThresh
     },
@@ -140,6 +235,8 @@ plugin.pipelines.register_function(
         "raw_data": "Raw data matrix.",
         "negative_control": "Name of FeatureTable matrix file containing data"
             " for sb samples.",
+        "negative_stats": "Precomputed negative control statistics (see"
+            " negative-control-stats) to use in place of negative-control.",
         "bins": "Name of the file containing bins, one bin per line, as output"
             " by the bin module. Each bin contains a tab-delimited list of"
             " peptide names.",
@@ -190,6 +287,7 @@ plugin.pipelines.register_function(
     inputs={
         "raw_data": FeatureTable[RawCounts],
         "negative_control": FeatureTable[Normed],
+        "negative_stats": NegativeControlStats,
         "bins": PeptideBins,
         "thresh_file": EnrichThresh,
         "linked":Link,
@@ -274,3 +372,331 @@ plugin.pipelines.register_function(
         " **ADD DECONV DESCRIPTION**"
 )
 
+
+plugin.pipelines.register_function(
+    function=diffEnrich_deconv_sweep,
+    inputs={
+        "raw_data": FeatureTable[RawCounts],
+        "negative_control": FeatureTable[Normed],
+        "negative_stats": NegativeControlStats,
+        "bins": PeptideBins,
+        "thresh_file": EnrichThresh,
+        "linked": Link,
+        "id_name_map": PepsirfDMP,
+    },
+    outputs=[
+        ("dir_out", Collection[DeconvBatch]),
+        ("score_per_round", Collection[ScorePerRound]),
+        ("map_dir", Collection[PeptideAssignmentMap]),
+        *shared_outputs
+    ],
+    parameters={
+        "deconv_thresholds": List[Int],
+        "mapfile_suffix": Str,
+        "outfile_suffix": Str,
+        "scoring_strategies": List[Str],
+        "score_filtering": Bool,
+        "score_tie_thresholds": List[Float],
+        "score_overlap_thresholds": List[Float],
+        "single_threaded": Bool,
+        "remove_file_types": Bool,
+        **shared_parameters,
+    },
+    input_descriptions=None,
+    output_descriptions={
+        "dir_out": "Deconv batch outputs keyed by"
+            " '<threshold>_<scoring strategy>_<tie threshold>_<overlap"
+            " threshold>'.",
+        "score_per_round": "Score per round outputs, keyed like dir_out.",
+        "map_dir": "Peptide assignment maps, keyed like dir_out."
+    },
+    parameter_descriptions={
+        "deconv_thresholds": "List of deconv thresholds to evaluate.",
+        "scoring_strategies": "List of deconv scoring strategies to"
+            " evaluate. Defaults to 'summation'.",
+        "score_tie_thresholds": "List of score tie thresholds to evaluate."
+            " Defaults to 0.0.",
+        "score_overlap_thresholds": "List of score overlap thresholds to"
+            " evaluate. Defaults to 0.0.",
+        **shared_parameter_description
+    },
+    name="diffEnrich deconv sweep Pepsirf Pipeline",
+    description="Runs the diffEnrich pipeline once and then runs pepsirf's"
+        " deconv module for every combination of the provided thresholds and"
+        " scoring strategies. Deconv runs are independent of each other and"
+        " run concurrently when the pipeline is executed in parallel."
+)
+
+plugin.pipelines.register_function(
+    function=diffEnrich_append,
+    inputs={
+        "raw_data": FeatureTable[RawCounts],
+        "bins": PeptideBins,
+        "col_sum": FeatureTable[Normed],
+        "diff": FeatureTable[NormedDifference],
+        "diff_ratio": FeatureTable[NormedDiffRatio],
+        "zscore": FeatureTable[Zscore],
+        "enrich": PairwiseEnrichment,
+        "negative_control": FeatureTable[Normed],
+        "negative_stats": NegativeControlStats,
+        "thresh_file": EnrichThresh
+    },
+    outputs=[
+        ("col_sum", FeatureTable[Normed]),
+        ("diff", FeatureTable[NormedDifference]),
+        ("diff_ratio", FeatureTable[NormedDiffRatio]),
+        ("zscore", FeatureTable[Zscore]),
+        ("zscore_nan", ZscoreNan),
+        ("enrich", PairwiseEnrichment)
+    ],
+    parameters={
+        "negative_id": Str,
+        "negative_names": List[Str],
+        "pepsirf_binary": Str,
+        "exact_z_thresh": Str,
+        "exact_cs_thresh": Str,
+        "raw_constraint": Int % Range(0, None),
+        "pepsirf_tsv_dir": Str,
+        "tsv_base_str": Str,
+        "hdi": Float % Range(0.0, 1.0),
+        "infer_pairs_source": Bool,
+        "flexible_reps_source": Bool,
+        "s_enrich_source": Bool,
+        "user_defined_source": MetadataColumn[Categorical],
+        "view_cache_mb": Int % Range(0, None),
+        "export_compression": Str % Choices("gzip", "bz2", "xz"),
+        "n_threads": Int % Range(1, None)
+    },
+    input_descriptions={
+        "raw_data": "Raw data matrix containing only the new samples.",
+        "bins": "The bins used for the previous run.",
+        "col_sum": "col_sum output of the previous run.",
+        "diff": "diff output of the previous run.",
+        "diff_ratio": "diff_ratio output of the previous run.",
+        "zscore": "zscore output of the previous run.",
+        "enrich": "enrich output of the previous run.",
+        "negative_control": "The negative control matrix used for the"
+            " previous run. If not provided, negative-id or negative-names"
+            " select the negative controls from the previous col_sum.",
+        "negative_stats": "The negative control statistics used for the"
+            " previous run, in place of negative-control.",
+        "thresh_file": "The threshold file used for the previous run."
+    },
+    output_descriptions={
+        "col_sum": "Previous col_sum with the new samples appended.",
+        "diff": "Previous diff with the new samples appended.",
+        "diff_ratio": "Previous diff_ratio with the new samples appended.",
+        "zscore": "Previous zscore with the new samples appended.",
+        "zscore_nan": "NaN z score report for the new samples.",
+        "enrich": "Previous enrich with the new samples' enriched peptides"
+            " added."
+    },
+    parameter_descriptions={
+        key: shared_parameter_description[key] for key in (
+            "negative_id", "negative_names", "pepsirf_binary",
+            "exact_z_thresh", "exact_cs_thresh", "raw_constraint",
+            "pepsirf_tsv_dir", "tsv_base_str", "hdi", "infer_pairs_source",
+            "flexible_reps_source", "s_enrich_source", "user_defined_source",
+            "view_cache_mb", "export_compression", "n_threads"
+        )
+    },
+    name="diffEnrich append Pepsirf Pipeline",
+    description="Adds newly sequenced samples to a previous diffEnrich run."
+        " Normalization, z scores and enrichment are computed for the new"
+        " samples only, using the previous run's negative controls and bins,"
+        " and are then merged into updated artifacts. Replicates of one"
+        " source must all be in the same run: sources with samples in both"
+        " the previous run and the new samples are rejected."
+)
+
+plugin.methods.register_function(
+    function=negativeControlStats,
+    inputs={"negative_control": FeatureTable[Normed]},
+    outputs=[("negative_stats", NegativeControlStats)],
+    parameters={
+        "negative_id": Str,
+        "negative_names": List[Str]
+    },
+    input_descriptions={
+        "negative_control": "Matrix containing the negative control samples,"
+            " either a dedicated negative control matrix or a plate's col-sum"
+            " normalized matrix."
+    },
+    output_descriptions={
+        "negative_stats": "Per-peptide mean, count and variance of the"
+            " negative controls."
+    },
+    parameter_descriptions={
+        "negative_id": "Only use the samples starting with this string as"
+            " negative controls.",
+        "negative_names": "Only use these samples as negative controls."
+    },
+    name="Negative control statistics",
+    description="Computes per-peptide summary statistics of a set of negative"
+        " controls once, so they can be passed to diffEnrich as negative-stats"
+        " on every plate that shares those controls instead of the full"
+        " negative control matrix."
+)
+
+plugin.methods.register_function(
+    function=pooledNegativeControl,
+    inputs={"negative_controls": List[FeatureTable[Normed]]},
+    outputs=[("negative_stats", NegativeControlStats)],
+    parameters={
+        "negative_id": Str,
+        "negative_names": List[Str],
+        "chunk_rows": Int % Range(1, None)
+    },
+    input_descriptions={
+        "negative_controls": "Negative control matrices (or col-sum"
+            " normalized plate matrices) of the plates to pool."
+    },
+    output_descriptions={
+        "negative_stats": "Per-peptide mean, count and variance of the"
+            " pooled negative controls."
+    },
+    parameter_descriptions={
+        "negative_id": "Only use the samples starting with this string as"
+            " negative controls.",
+        "negative_names": "Only use these samples as negative controls.",
+        "chunk_rows": "Number of peptide rows read from a matrix at a time."
+    },
+    name="Pooled negative control",
+    description="Pools the negative controls of many plates into per-peptide"
+        " statistics without building one combined matrix. Matrices are"
+        " streamed one at a time and the mean and variance are updated with"
+        " Welford's algorithm, so memory is bounded by the number of"
+        " peptides. The output can be passed to diffEnrich as negative-stats."
+)
+
+plugin.visualizers.register_function(
+    function=deferredVisualization,
+    inputs={},
+    parameters={
+        "run_dir": Str,
+        "visualization": Str % Choices(*VISUALIZATIONS)
+    },
+    parameter_descriptions={
+        "run_dir": "Run directory holding the render data.",
+        "visualization": "Name of the visualization that was deferred."
+    },
+    name="Deferred visualization",
+    description="Placeholder returned by diffEnrich with"
+        " defer-visualizations, pointing to the run directory the real"
+        " visualization can be rendered from."
+)
+
+plugin.pipelines.register_function(
+    function=renderVisualizations,
+    inputs={},
+    outputs=[
+        ("rc_boxplot", Visualization),
+        ("enrich_count_boxplot", Visualization),
+        ("zscore_scatter", Visualization),
+        ("colsum_scatter", Visualization),
+        ("zenrich_scatter", Visualization)
+    ],
+    parameters={
+        "run_dir": Str,
+        "pepsirf_binary": Str
+    },
+    parameter_descriptions={
+        "run_dir": "Run directory written by diffEnrich with"
+            " defer-visualizations (<pepsirf-tsv-dir>/<tsv-base-str>_render).",
+        "pepsirf_binary": "The binary to call pepsirf on your system."
+            " Defaults to the one used by the run."
+    },
+    output_descriptions={
+        "rc_boxplot": "Read counts boxplot of the run.",
+        "enrich_count_boxplot": "Enriched peptide counts boxplot of the run.",
+        "zscore_scatter": "Replicate z score scatter plots of the run.",
+        "colsum_scatter": "Replicate col-sum scatter plots of the run.",
+        "zenrich_scatter": "zenrich plot of the run."
+    },
+    name="Render deferred visualizations",
+    description="Renders the visualizations of a diffEnrich run made with"
+        " defer-visualizations from its run directory. All renders are"
+        " issued at once, so they run concurrently with qiime2's --parallel"
+        " option."
+)
+
+plugin.visualizers.register_function(
+    function=enrichmentIndex,
+    inputs={"enrich": PairwiseEnrichment},
+    parameters={
+        "index_path": Str,
+        "run_name": Str
+    },
+    input_descriptions={
+        "enrich": "enrich output of a diffEnrich run."
+    },
+    parameter_descriptions={
+        "index_path": "SQLite file holding the index. It is created if it"
+            " does not exist.",
+        "run_name": "Name the run is indexed under. Indexing a run name"
+            " again replaces its entries."
+    },
+    name="Enrichment index",
+    description="Adds a run's enriched peptides to a persistent inverted"
+        " index from peptide to the runs and samples it was enriched in, so"
+        " peptides can be looked up across many runs without reading their"
+        " enriched directories. Look peptides up with"
+        " q2_autopepsirf.utils.db.lookup_peptide."
+)
+
+plugin.visualizers.register_function(
+    function=warehouseIngest,
+    inputs={
+        "col_sum": FeatureTable[Normed],
+        "zscore": FeatureTable[Zscore],
+        "enrich": PairwiseEnrichment
+    },
+    parameters={
+        "warehouse_path": Str,
+        "run_name": Str
+    },
+    input_descriptions={
+        "col_sum": "col_sum output of a diffEnrich run.",
+        "zscore": "zscore output of the same run.",
+        "enrich": "enrich output of the same run."
+    },
+    parameter_descriptions={
+        "warehouse_path": "SQLite file holding the warehouse. It is created"
+            " if it does not exist, and can be the same file as an"
+            " enrichment-index.",
+        "run_name": "Name the run is stored under. Ingesting a run name again"
+            " replaces its rows."
+    },
+    name="Results warehouse ingest",
+    description="Adds a run's col-sum and z scores, keyed by run, sample and"
+        " peptide, and its enriched peptides to a local SQLite warehouse."
+        " Rows are bulk inserted in one transaction and indexed by sample"
+        " and by peptide, so cross-run queries"
+        " (q2_autopepsirf.utils.db.peptide_scores, sample_scores) do not"
+        " reload any tsv."
+)
+
+plugin.methods.register_function(
+    function=mergeZscores,
+    inputs={"zscores": List[FeatureTable[Zscore]]},
+    outputs=[("merged", FeatureTable[Zscore])],
+    parameters={"chunk_rows": Int % Range(1, None)},
+    input_descriptions={
+        "zscores": "zscore outputs of the diffEnrich runs to combine. Sample"
+            " names must be unique across runs."
+    },
+    output_descriptions={
+        "merged": "Matrix with the samples of every run, with one row per"
+            " peptide found in any run, sorted by peptide name. Peptides"
+            " missing from a run are nan for its samples."
+    },
+    parameter_descriptions={
+        "chunk_rows": "Number of rows sorted in memory at a time when a"
+            " matrix is not sorted by peptide name."
+    },
+    name="Merge z score matrices",
+    description="Joins the z score matrices of many runs on peptide name in"
+        " bounded memory: unsorted matrices are sorted externally and all"
+        " matrices are streamed through a k-way merge, so the matrices are"
+        " never loaded whole. Values are copied as text."
+)
@@ -0,0 +1,77 @@
+from q2_autopepsirf.utils.bitset import EnrichmentBitset, POPCOUNT
+from q2_autopepsirf.utils.ids import IdTable
+
+import numpy as np
+import os
+import tempfile
+import unittest
+
+
+class EnrichmentBitsetTests(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.peptides = ["pep_%d" % (i) for i in range(203)]
+        self.enriched = {
+            "S%d" % (i): sorted(
+                rng.choice(self.peptides, rng.integers(0, 60), replace=False)
+            )
+            for i in range(6)
+        }
+        self.tmp = tempfile.TemporaryDirectory()
+        for sample, peptides in self.enriched.items():
+            path = os.path.join(self.tmp.name, sample + "_enriched.txt")
+            with open(path, "w") as fh:
+                fh.write("".join(p + "\n" for p in peptides))
+        # files that are not per sample enriched lists are skipped
+        report = os.path.join(self.tmp.name, "failure_report.txt")
+        with open(report, "w") as fh:
+            fh.write("S9\n")
+        self.bits = EnrichmentBitset.from_dir(
+            self.tmp.name, IdTable(self.peptides)
+        )
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_popcount_table(self):
+        self.assertEqual(
+            POPCOUNT.tolist(), [bin(i).count("1") for i in range(256)]
+        )
+
+    def test_counts_and_membership(self):
+        self.assertEqual(sorted(self.bits.samples), sorted(self.enriched))
+        counts = dict(zip(self.bits.samples, self.bits.counts()))
+        for sample, peptides in self.enriched.items():
+            self.assertEqual(counts[sample], len(peptides))
+            self.assertEqual(
+                sorted(self.bits.enriched(sample)), sorted(peptides)
+            )
+
+    def test_set_operations_match_python_sets(self):
+        sets = {s: set(p) for s, p in self.enriched.items()}
+        chosen = ["S1", "S3", "S4"]
+        self.assertEqual(
+            set(self.bits.union(chosen)),
+            set.union(*(sets[s] for s in chosen))
+        )
+        self.assertEqual(
+            set(self.bits.intersection(chosen)),
+            set.intersection(*(sets[s] for s in chosen))
+        )
+        self.assertEqual(set(self.bits.union()), set.union(*sets.values()))
+
+    def test_unknown_sample(self):
+        with self.assertRaises(KeyError):
+            self.bits.union(["S1", "missing"])
+
+    def test_save_load_round_trip(self):
+        path = os.path.join(self.tmp.name, "bits.npz")
+        self.bits.save(path)
+        loaded = EnrichmentBitset.load(path)
+        np.testing.assert_array_equal(loaded.bits, self.bits.bits)
+        self.assertEqual(loaded.samples.names, self.bits.samples.names)
+        self.assertEqual(loaded.peptides.names, self.peptides)
+
+
+if __name__ == "__main__":
+    unittest.main()
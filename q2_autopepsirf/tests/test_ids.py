@@ -0,0 +1,43 @@
+from q2_autopepsirf.utils.ids import IdTable, read_bins
+
+import numpy as np
+import os
+import tempfile
+import unittest
+
+
+class IdTableTests(unittest.TestCase):
+    def test_ids_in_order_of_first_appearance(self):
+        table = IdTable(["b", "a", "b", "c"])
+        self.assertEqual(table.names, ["b", "a", "c"])
+        self.assertEqual([table.get(n) for n in "abc"], [1, 0, 2])
+
+    def test_encode_decode_round_trip(self):
+        names = ["pep_%d" % (i) for i in range(1000)]
+        table = IdTable()
+        ids = table.encode(names)
+        self.assertEqual(ids.dtype, np.int32)
+        np.testing.assert_array_equal(ids, np.arange(1000))
+        self.assertEqual(table.decode(ids), names)
+
+    def test_encode_without_add_marks_unknown(self):
+        table = IdTable(["a", "b"])
+        ids = table.encode(["b", "x", "a"], add=False)
+        np.testing.assert_array_equal(ids, [1, -1, 0])
+        self.assertEqual(len(table), 2)
+        self.assertNotIn("x", table)
+
+
+class ReadBinsTests(unittest.TestCase):
+    def test_bins_as_id_arrays(self):
+        table = IdTable(["p1", "p2", "p3"])
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "bins.tsv")
+            with open(path, "w") as fh:
+                fh.write("p1\tp3\n\np2\tp9\n")
+            bins = read_bins(path, table)
+        self.assertEqual([b.tolist() for b in bins], [[0, 2], [1, -1]])
+
+
+if __name__ == "__main__":
+    unittest.main()
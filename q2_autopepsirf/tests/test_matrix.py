@@ -0,0 +1,109 @@
+from q2_autopepsirf.utils.matrix import (
+    PeptideMatrix, format_fixed, read_tsv_parallel, split_lines, write_tsv
+)
+
+import numpy as np
+import os
+import pandas as pd
+import tempfile
+import unittest
+
+
+def printf_rows(values, precision):
+    return "".join(
+        "\t".join("%.*f" % (precision, v) for v in row) + "\n"
+        for row in values
+    ).encode()
+
+
+class FormatFixedTests(unittest.TestCase):
+    def test_matches_printf(self):
+        rng = np.random.default_rng(0)
+        values = np.concatenate([
+            rng.normal(0, 50, (200, 7)),
+            rng.normal(0, 1e6, (20, 7)),
+            np.round(rng.normal(0, 5, (20, 7)), 3)
+        ])
+        for precision in (0, 1, 2, 3):
+            self.assertEqual(
+                format_fixed(values, precision),
+                printf_rows(values, precision)
+            )
+
+    def test_ties_round_like_printf(self):
+        values = np.array([[0.125, 0.375, 2.675, -1.005, 1.5, 2.5]])
+        for precision in (0, 2):
+            self.assertEqual(
+                format_fixed(values, precision),
+                printf_rows(values, precision)
+            )
+
+    def test_special_values(self):
+        values = np.array([[np.nan, np.inf, -np.inf, -0.0, -0.001]])
+        self.assertEqual(
+            format_fixed(values, 2), b"nan\tinf\t-inf\t-0.00\t-0.00\n"
+        )
+
+
+class WriteReadTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "matrix.tsv")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_write_tsv_matches_to_csv(self):
+        rng = np.random.default_rng(1)
+        frame = pd.DataFrame(
+            rng.normal(0, 20, (500, 6)),
+            index=pd.Index(["pep_%d" % (i) for i in range(500)],
+                           name="Sequence name"),
+            columns=["s%d" % (i) for i in range(6)]
+        )
+        write_tsv(PeptideMatrix.from_frame(frame), self.path, precision=2,
+                  chunk_cells=100)
+        expected = frame.to_csv(sep="\t", float_format="%.2f")
+        with open(self.path) as fh:
+            self.assertEqual(fh.read(), expected)
+
+    def test_round_trip(self):
+        rng = np.random.default_rng(2)
+        matrix = PeptideMatrix(
+            np.round(rng.normal(0, 5, (3000, 4)), 2).astype(np.float32),
+            ["pep_%d" % (i) for i in range(3000)], ["a", "b", "c", "d"]
+        )
+        matrix.to_tsv(self.path, precision=2)
+        for n_workers in (1, 3):
+            values, peptides, samples, index_name = read_tsv_parallel(
+                self.path, n_workers=n_workers
+            )
+            np.testing.assert_array_equal(values, matrix.values)
+            self.assertEqual(peptides, matrix.peptides.names)
+            self.assertEqual(samples, ["a", "b", "c", "d"])
+            self.assertEqual(index_name, "Sequence name")
+
+    def test_header_only_matrix(self):
+        with open(self.path, "w") as fh:
+            fh.write("Sequence name\ta\tb\n")
+        values, peptides, samples, _ = read_tsv_parallel(
+            self.path, n_workers=2
+        )
+        self.assertEqual(values.shape, (0, 2))
+        self.assertEqual((peptides, samples), ([], ["a", "b"]))
+
+    def test_split_lines_covers_file_at_line_starts(self):
+        with open(self.path, "w") as fh:
+            fh.write("h\n" + "".join("line%d\n" % (i) for i in range(50000)))
+        ranges = split_lines(self.path, 2, 8)
+        self.assertEqual(ranges[0][0], 2)
+        self.assertEqual(ranges[-1][1], os.path.getsize(self.path))
+        with open(self.path, "rb") as fh:
+            for (_, end), (start, _) in zip(ranges, ranges[1:]):
+                self.assertEqual(end, start)
+                fh.seek(start - 1)
+                self.assertEqual(fh.read(1), b"\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+from q2_autopepsirf.utils.merge import (
+    external_sort, is_sorted, kway_merge, merge_columns, merge_dirs
+)
+
+import numpy as np
+import os
+import pandas as pd
+import tempfile
+import unittest
+
+
+def read_text(path):
+    return pd.read_csv(
+        path, sep="\t", index_col=0, dtype=str, keep_default_na=False
+    )
+
+
+class MergeTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.rng = np.random.default_rng(0)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write_run(self, name, peptides, samples):
+        frame = pd.DataFrame(
+            np.round(self.rng.normal(0, 10, (len(peptides), len(samples))), 2),
+            index=pd.Index(peptides, name="Sequence name"), columns=samples
+        ).astype(str)
+        path = os.path.join(self.tmp.name, name)
+        frame.to_csv(path, sep="\t")
+        return path, frame
+
+    def test_external_sort(self):
+        peptides = ["pep_%d" % (i) for i in self.rng.permutation(500)]
+        path, frame = self.write_run("run.tsv", peptides, ["a", "b"])
+        self.assertFalse(is_sorted(path))
+        dest = os.path.join(self.tmp.name, "sorted.tsv")
+        external_sort(path, dest, chunk_rows=37, tmpdir=self.tmp.name)
+        self.assertTrue(is_sorted(dest))
+        pd.testing.assert_frame_equal(read_text(dest), frame.sort_index())
+
+    def test_kway_merge_matches_outer_join(self):
+        runs = []
+        for i in range(4):
+            # every run holds a random subset of the peptides
+            order = self.rng.permutation(300)
+            peptides = [
+                "pep_%03d" % (p) for p in order[self.rng.random(300) < 0.7]
+            ]
+            if i % 2:
+                peptides.sort()
+            runs.append(self.write_run(
+                "run%d.tsv" % (i), peptides, ["r%d_s1" % (i), "r%d_s2" % (i)]
+            ))
+
+        dest = os.path.join(self.tmp.name, "merged.tsv")
+        kway_merge(
+            [path for path, _ in runs], dest, chunk_rows=50,
+            tmpdir=self.tmp.name
+        )
+        expected = pd.concat(
+            [frame for _, frame in runs], axis=1, join="outer"
+        ).sort_index().fillna("nan")
+        pd.testing.assert_frame_equal(read_text(dest), expected)
+
+    def test_duplicate_samples_raise(self):
+        a, _ = self.write_run("a.tsv", ["p1", "p2"], ["s1"])
+        b, _ = self.write_run("b.tsv", ["p1", "p2"], ["s1"])
+        with self.assertRaises(ValueError):
+            kway_merge([a, b], os.path.join(self.tmp.name, "out.tsv"))
+
+    def test_merge_columns_aligns_on_peptide(self):
+        a, frame_a = self.write_run("a.tsv", ["p1", "p2", "p3"], ["s1"])
+        b, frame_b = self.write_run("b.tsv", ["p3", "p1", "p2"], ["s2"])
+        dest = os.path.join(self.tmp.name, "out.tsv")
+        merge_columns([a, b], dest)
+        expected = pd.concat([frame_a, frame_b.loc[frame_a.index]], axis=1)
+        pd.testing.assert_frame_equal(read_text(dest), expected)
+
+
+class MergeDirsTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.runs = []
+        for run, files in enumerate((
+                {"A_enriched.txt": "p1\n", "failure.txt": "name\nX\n"},
+                {"B_enriched.txt": "p2\n", "failure.txt": "name\nY"})):
+            path = os.path.join(self.tmp.name, "run%d" % (run))
+            os.mkdir(path)
+            for name, text in files.items():
+                with open(os.path.join(path, name), "w") as fh:
+                    fh.write(text)
+            self.runs.append(path)
+        self.dest = os.path.join(self.tmp.name, "merged")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def read(self, name):
+        with open(os.path.join(self.dest, name)) as fh:
+            return fh.read()
+
+    def test_collision_raises(self):
+        with self.assertRaises(ValueError):
+            merge_dirs(self.runs, self.dest)
+
+    def test_concatenates_selected_files(self):
+        merge_dirs(
+            self.runs, self.dest,
+            concat=lambda name: not name.endswith("_enriched.txt")
+        )
+        self.assertEqual(
+            sorted(os.listdir(self.dest)),
+            ["A_enriched.txt", "B_enriched.txt", "failure.txt"]
+        )
+        self.assertEqual(self.read("A_enriched.txt"), "p1\n")
+        self.assertEqual(self.read("failure.txt"), "name\nX\nY\n")
+        # the sources are left as they were
+        with open(os.path.join(self.runs[0], "failure.txt")) as fh:
+            self.assertEqual(fh.read(), "name\nX\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
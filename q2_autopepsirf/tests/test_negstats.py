@@ -0,0 +1,80 @@
+from q2_autopepsirf.utils.negstats import (
+    RunningStats, pool_stats, select_controls, summarize
+)
+
+import numpy as np
+import os
+import pandas as pd
+import tempfile
+import unittest
+
+
+class RunningStatsTests(unittest.TestCase):
+    def test_matches_summarize_of_all_columns(self):
+        rng = np.random.default_rng(0)
+        values = rng.normal(100, 30, (50, 12))
+        values[rng.random(values.shape) < 0.1] = np.nan
+        peptides = ["pep_%d" % (i) for i in range(50)]
+
+        stats = RunningStats()
+        for block in np.array_split(np.arange(12), 4):
+            stats.update(peptides, values[:, block])
+        count, mean, variance = stats.result()
+
+        expected = summarize(values)
+        np.testing.assert_array_equal(count, expected[0])
+        np.testing.assert_allclose(mean, expected[1])
+        np.testing.assert_allclose(variance, expected[2])
+
+    def test_plates_with_different_peptides(self):
+        stats = RunningStats()
+        stats.update(["a", "b"], np.array([[1.0, 3.0], [10.0, 10.0]]))
+        stats.update(["b", "c"], np.array([[20.0], [5.0]]))
+        count, mean, variance = stats.result()
+        self.assertEqual(stats.peptides.names, ["a", "b", "c"])
+        np.testing.assert_array_equal(count, [2, 3, 1])
+        np.testing.assert_allclose(mean, [2.0, 40.0 / 3, 5.0])
+        np.testing.assert_allclose(variance[:2], [2.0, 100.0 / 3])
+        self.assertTrue(np.isnan(variance[2]))
+
+
+class PoolStatsTests(unittest.TestCase):
+    def test_pools_selected_controls_of_every_file(self):
+        rng = np.random.default_rng(1)
+        peptides = ["pep_%d" % (i) for i in range(30)]
+        frames = [
+            pd.DataFrame(
+                rng.normal(50, 10, (30, 4)),
+                index=pd.Index(peptides, name="Sequence name"),
+                columns=["NC_%d_%d" % (p, i) for i in range(2)]
+                + ["S_%d_%d" % (p, i) for i in range(2)]
+            )
+            for p in range(3)
+        ]
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = []
+            for i, frame in enumerate(frames):
+                paths.append(os.path.join(tmp, "plate%d.tsv" % (i)))
+                frame.to_csv(paths[-1], sep="\t", float_format="%.17g")
+            stats = pool_stats(paths, negative_id="NC", chunksize=7)
+
+        controls = pd.concat(
+            [frame.filter(like="NC") for frame in frames], axis=1
+        )
+        count, mean, variance = stats.result()
+        np.testing.assert_array_equal(count, np.full(30, 6))
+        np.testing.assert_allclose(mean, controls.mean(axis=1))
+        np.testing.assert_allclose(variance, controls.var(axis=1))
+
+    def test_select_controls(self):
+        header = ["Sequence name", "NC_1", "S_1", "NC_2"]
+        self.assertEqual(select_controls(header, "NC"), ["NC_1", "NC_2"])
+        self.assertEqual(select_controls(header, None, ["S_1"]), ["S_1"])
+        with self.assertRaises(ValueError):
+            select_controls(header, "XX")
+        with self.assertRaises(ValueError):
+            select_controls(header, None, ["missing"])
+
+
+if __name__ == "__main__":
+    unittest.main()
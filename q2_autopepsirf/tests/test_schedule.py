@@ -0,0 +1,39 @@
+from q2_autopepsirf.utils.schedule import (
+    PEPSIRF_STEPS, critical_path, niced_binary, step_nice
+)
+
+import os
+import subprocess
+import sys
+import unittest
+
+
+class ScheduleTests(unittest.TestCase):
+    def test_critical_path(self):
+        self.assertEqual(
+            critical_path(), ["col_sum", "diff", "zscore", "enrich", "deconv"]
+        )
+
+    def test_step_nice(self):
+        nice = step_nice(["zscore=3"], configurable=PEPSIRF_STEPS)
+        self.assertEqual(nice["zscore"], 3)
+        self.assertEqual(nice["enrich"], 0)
+        self.assertEqual(nice["diff_ratio"], 10)
+        with self.assertRaises(ValueError):
+            step_nice(["zenrich_scatter=3"], configurable=PEPSIRF_STEPS)
+        with self.assertRaises(ValueError):
+            step_nice(["zscore=high"], configurable=PEPSIRF_STEPS)
+
+    def test_niced_binary(self):
+        self.assertEqual(niced_binary("pepsirf", 0), "pepsirf")
+        wrapper = niced_binary(sys.executable, 5)
+        self.assertEqual(niced_binary(sys.executable, 5), wrapper)
+        out = subprocess.run(
+            [wrapper, "-c", "import os; print(os.nice(0))"],
+            check=True, capture_output=True, text=True
+        )
+        self.assertEqual(int(out.stdout), min(os.nice(0) + 5, 19))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,16 @@
+from q2_autopepsirf.utils.source import group_sources, split_groups
+
+import unittest
+
+
+class SplitGroupsTests(unittest.TestCase):
+    def test_groups_spanning_runs(self):
+        previous = ["VW_1_A", "VW_1_B", "VW_2_A", "NC_1"]
+        new = ["VW_2_B", "VW_3_A", "VW_3_B"]
+        groups = group_sources(previous + new)
+        self.assertEqual(split_groups(groups, previous), ["VW_2"])
+        self.assertEqual(split_groups(group_sources(new), previous), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
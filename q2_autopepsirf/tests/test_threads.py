@@ -0,0 +1,24 @@
+from q2_autopepsirf.utils.threads import ThreadBudget, available_cpus
+
+import os
+import unittest
+
+
+class ThreadBudgetTests(unittest.TestCase):
+    def test_defaults_to_affinity(self):
+        self.assertEqual(ThreadBudget().total, available_cpus())
+        if hasattr(os, "sched_getaffinity"):
+            self.assertEqual(
+                available_cpus(), len(os.sched_getaffinity(0))
+            )
+
+    def test_share(self):
+        budget = ThreadBudget(8)
+        self.assertEqual(budget.share(), 8)
+        self.assertEqual(budget.share(3), 2)
+        self.assertEqual(budget.share(1, reserved=2), 6)
+        self.assertEqual(ThreadBudget(1).share(4, reserved=1), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,39 @@
+from q2_autopepsirf.utils.validate import validate_inputs
+
+import os
+import tempfile
+import unittest
+
+
+class ValidateInputsTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.raw = os.path.join(self.tmp.name, "raw.tsv")
+        with open(self.raw, "w") as fh:
+            fh.write("Sequence name\tNC_1\tS_1\np1\t5\t7\np2\t3\t9\n")
+        self.bins = os.path.join(self.tmp.name, "bins.tsv")
+        with open(self.bins, "w") as fh:
+            fh.write("p1\tp2\n")
+        self.stats = os.path.join(self.tmp.name, "stats.tsv")
+        with open(self.stats, "w") as fh:
+            fh.write("Sequence name\tnegative_control_mean\np1\t4\np2\t3\n")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_negative_stats(self):
+        validate_inputs(
+            self.raw, self.bins, negative_control_path=self.stats,
+            negative_stats=True
+        )
+        for selection in ({"negative_id": "NC"},
+                          {"negative_names": ["NC_1"]}):
+            with self.assertRaisesRegex(ValueError, "negative-stats"):
+                validate_inputs(
+                    self.raw, self.bins, negative_control_path=self.stats,
+                    negative_stats=True, **selection
+                )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+from q2_autopepsirf.utils.views import ViewCache, view_size
+
+import numpy as np
+import os
+import tempfile
+import unittest
+import warnings
+
+
+class FakeArtifact:
+    def __init__(self, uuid):
+        self.uuid = uuid
+
+
+class FakeFormat:
+    def __init__(self, path):
+        self.path = path
+
+
+class ViewCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.loads = []
+
+    def loader(self, n_bytes):
+        def load(artifact):
+            self.loads.append(artifact.uuid)
+            return np.zeros(n_bytes, dtype=np.uint8)
+        return load
+
+    def test_hit_returns_same_view(self):
+        cache = ViewCache()
+        first = cache.load(FakeArtifact("a"), "m", self.loader(10))
+        second = cache.load(FakeArtifact("a"), "m", self.loader(10))
+        self.assertIs(first, second)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_view_type_is_part_of_the_key(self):
+        cache = ViewCache()
+        cache.load(FakeArtifact("a"), "m", self.loader(10))
+        cache.load(FakeArtifact("a"), "other", self.loader(10))
+        self.assertEqual(cache.misses, 2)
+
+    def test_lru_eviction_within_budget(self):
+        cache = ViewCache(max_bytes=250, keep_recent=1)
+        for uuid in "abc":
+            cache.load(FakeArtifact(uuid), "m", self.loader(100))
+        cache.load(FakeArtifact("a"), "m", self.loader(100))
+        self.assertEqual(self.loads, ["a", "b", "c", "a"])
+        self.assertLessEqual(cache.used_bytes, 250)
+
+    def test_oversized_view_is_kept(self):
+        cache = ViewCache(max_bytes=100)
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            for _ in range(5):
+                cache.load(FakeArtifact("a"), "m", self.loader(1000))
+        self.assertEqual((cache.hits, cache.misses), (4, 1))
+        self.assertEqual(cache.used_bytes, 1000)
+        self.assertEqual(len(caught), 1)
+
+    def test_alternating_views_do_not_evict_each_other(self):
+        cache = ViewCache(max_bytes=1000)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            for uuid in "abababab":
+                cache.load(FakeArtifact(uuid), "m", self.loader(800))
+        self.assertEqual(self.loads, ["a", "b"])
+
+    def test_format_views_are_sized_on_disk(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "matrix.tsv")
+            with open(path, "w") as fh:
+                fh.write("x" * 12345)
+            self.assertEqual(view_size(FakeFormat(path)), 12345)
+            self.assertEqual(view_size(FakeFormat(tmp)), 12345)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+from q2_autopepsirf.utils.matrix import PeptideMatrix
+from q2_autopepsirf.utils.zgrid import grid_counts, z_grid
+
+import numpy as np
+import unittest
+
+
+def brute_passes(values, thresh):
+    bounds = [float(v) for v in thresh.split(",")]
+    return (all(v >= min(bounds) for v in values)
+            and any(v >= max(bounds) for v in values))
+
+
+class ZGridTests(unittest.TestCase):
+    def test_upper_bound_is_not_inclusive(self):
+        np.testing.assert_array_equal(z_grid(5, 30, 5), [5, 10, 15, 20, 25])
+        np.testing.assert_array_equal(z_grid(1, 4, 1), [1, 2, 3])
+
+    def test_grid_counts_match_brute_force(self):
+        rng = np.random.default_rng(0)
+        n_peptides = 400
+        samples = ["A_1", "A_2", "B_1", "B_2", "B_3"]
+        groups = {"A": ["A_1", "A_2"], "B": ["B_1", "B_2", "B_3"]}
+        z = rng.normal(5, 8, (n_peptides, len(samples)))
+        z[rng.random(z.shape) < 0.05] = np.nan
+        cs = rng.gamma(2, 15, (n_peptides, len(samples)))
+        peptides = ["pep_%d" % (i) for i in range(n_peptides)]
+
+        zscores = PeptideMatrix(z, peptides, samples)
+        # the col-sum rows are in a different order than the z score rows
+        order = rng.permutation(n_peptides)
+        col_sum = PeptideMatrix(
+            cs[order], [peptides[i] for i in order], samples
+        )
+
+        grid = z_grid(0, 20, 4)
+        exact = ["6,10", "3"]
+        labels, counts = grid_counts(
+            zscores, col_sum, groups, grid,
+            exact_z_thresh=exact, exact_cs_thresh="20"
+        )
+        self.assertEqual(labels, ["0", "4", "8", "12", "16", "6,10", "3"])
+
+        for group, names in groups.items():
+            cols = [samples.index(name) for name in names]
+            expected = []
+            for thresh in ["%g" % (t) for t in grid] + exact:
+                expected.append(sum(
+                    brute_passes(cs[i, cols], "20")
+                    and not np.isnan(z[i, cols]).any()
+                    and brute_passes(z[i, cols], thresh)
+                    for i in range(n_peptides)
+                ))
+            self.assertEqual(counts[group].tolist(), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+from q2_autopepsirf.utils.ids import IdTable
+
+import numpy as np
+import os
+
+# suffix of the per sample files written by pepsirf's enrich module
+ENRICHED_SUFFIX = "_enriched.txt"
+
+# number of set bits of every byte value
+POPCOUNT = np.unpackbits(
+    np.arange(256, dtype=np.uint8)[:, None], axis=1
+).sum(axis=1).astype(np.int64)
+
+
+# Name: read_enriched_dir
+# Process: reads the per sample files of an enriched peptide directory,
+# other files (Ex: enrichment failure reports) are skipped
+# Method Input/Parameters: dirpath
+# Method output/Returned: dict of sample name -> list of peptide names
+def read_enriched_dir(dirpath):
+    enriched = {}
+    for name in sorted(os.listdir(dirpath)):
+        if not name.endswith(ENRICHED_SUFFIX):
+            continue
+        with open(os.path.join(dirpath, name)) as fh:
+            enriched[name[:-len(ENRICHED_SUFFIX)]] = [
+                line.strip() for line in fh if line.strip()
+            ]
+    return enriched
+
+
+# Name: EnrichmentBitset
+# Process: enrichment results as a bit-packed samples x peptides matrix (one
+# row of np.packbits bits per sample or replicate group) with its sample and
+# peptide indexes. Counts and set operations across samples are bitwise
+# operations on the packed rows, so the enriched files are only parsed once.
+# Method Input/Parameters: bits (uint8 array, samples x ceil(peptides / 8)),
+# samples (list of names), peptides (IdTable or list of names)
+class EnrichmentBitset:
+    def __init__(self, bits, samples, peptides):
+        self.bits = bits
+        self.samples = IdTable(samples)
+        self.peptides = (
+            peptides if isinstance(peptides, IdTable) else IdTable(peptides)
+        )
+
+    # builds the bitset of an enriched peptide directory. Bit columns follow
+    # the order of peptide_ids (Ex: the rows of the col-sum matrix), peptides
+    # that are not in it yet are appended.
+    @classmethod
+    def from_dir(cls, dirpath, peptide_ids=None):
+        peptides = peptide_ids if peptide_ids is not None else IdTable()
+        enriched = read_enriched_dir(dirpath)
+        rows = [peptides.encode(names) for names in enriched.values()]
+
+        dense = np.zeros((len(rows), len(peptides)), dtype=bool)
+        for i, ids in enumerate(rows):
+            dense[i, ids] = True
+        return cls(np.packbits(dense, axis=1), list(enriched), peptides)
+
+    def __len__(self):
+        return len(self.samples)
+
+    def _rows(self, samples):
+        if samples is None:
+            return self.bits
+        ids = self.samples.encode(samples, add=False)
+        if (ids < 0).any():
+            raise KeyError(
+                "Samples not in bitset: %s"
+                % (", ".join(s for s, i in zip(samples, ids) if i < 0))
+            )
+        return self.bits[ids]
+
+    def _names(self, packed):
+        present = np.unpackbits(packed, count=len(self.peptides))
+        return self.peptides.decode(np.flatnonzero(present))
+
+    # number of enriched peptides of every sample
+    def counts(self):
+        return POPCOUNT[self.bits].sum(axis=1)
+
+    def enriched(self, sample):
+        return self._names(self._rows([sample])[0])
+
+    # peptides enriched in any of the samples (all samples when None)
+    def union(self, samples=None):
+        return self._names(np.bitwise_or.reduce(self._rows(samples), axis=0))
+
+    # peptides enriched in every one of the samples (all samples when None)
+    def intersection(self, samples=None):
+        return self._names(np.bitwise_and.reduce(self._rows(samples), axis=0))
+
+    def save(self, filepath):
+        np.savez_compressed(
+            filepath,
+            bits=self.bits,
+            samples=np.array(self.samples.names, dtype=str),
+            peptides=np.array(self.peptides.names, dtype=str)
+        )
+
+    @classmethod
+    def load(cls, filepath):
+        data = np.load(filepath)
+        return cls(
+            data["bits"], data["samples"].tolist(),
+            data["peptides"].tolist()
+        )
@@ -0,0 +1,78 @@
+import numpy as np
+import os
+import pandas as pd
+
+# the fallback layout is a directory holding these three files
+NPY_VALUES = "values.npy"
+NPY_PEPTIDES = "peptides.txt"
+NPY_SAMPLES = "samples.txt"
+
+
+def _has_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+# Name: write_columnar
+# Process: writes a peptide x sample matrix in a columnar binary layout so
+# single samples can be loaded without reading the whole file. Parquet is used
+# when pyarrow is installed, otherwise a directory with a column-major .npy
+# matrix and plain text peptide/sample indexes.
+# Method Input/Parameters: matrix (PeptideMatrix), dest (path
+# without extension), engine ("parquet", "npy" or None to pick)
+# Method output/Returned: path written
+def write_columnar(matrix, dest, engine=None):
+    if engine is None:
+        engine = "parquet" if _has_pyarrow() else "npy"
+
+    if engine == "parquet":
+        path = dest + ".parquet"
+        matrix.to_frame().rename(columns=str).reset_index().to_parquet(
+            path, index=False
+        )
+        return path
+
+    path = dest + "_npy"
+    os.makedirs(path, exist_ok=True)
+    # column-major so each sample is one contiguous block on disk
+    np.save(
+        os.path.join(path, NPY_VALUES),
+        np.asfortranarray(matrix.values)
+    )
+    for name, labels in (
+            (NPY_PEPTIDES, matrix.peptides), (NPY_SAMPLES, matrix.samples)):
+        with open(os.path.join(path, name), "w") as fh:
+            fh.write("\n".join(str(label) for label in labels) + "\n")
+    return path
+
+
+# Name: read_columnar
+# Process: loads all or a subset of the samples written by write_columnar.
+# Only the requested columns are read from disk.
+# Method Input/Parameters: path (.parquet file or _npy directory), samples
+# (list of sample names, None for all)
+# Method output/Returned: pandas DataFrame indexed by peptide
+def read_columnar(path, samples=None):
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        peptide_col = pq.read_schema(path).names[0]
+        columns = None if samples is None else [peptide_col] + list(samples)
+        return pd.read_parquet(path, columns=columns).set_index(peptide_col)
+
+    with open(os.path.join(path, NPY_PEPTIDES)) as fh:
+        peptides = fh.read().splitlines()
+    with open(os.path.join(path, NPY_SAMPLES)) as fh:
+        all_samples = fh.read().splitlines()
+
+    values = np.load(os.path.join(path, NPY_VALUES), mmap_mode="r")
+    if samples is None:
+        samples = all_samples
+    lookup = {name: i for i, name in enumerate(all_samples)}
+    columns = [lookup[name] for name in samples]
+    return pd.DataFrame(
+        np.array(values[:, columns]), index=peptides, columns=list(samples)
+    )
@@ -0,0 +1,85 @@
+from itertools import combinations
+
+import numpy as np
+
+COLUMNS = ["pearson", "spearman", "frac_both_above", "slope"]
+
+
+# average ranks, ties share the mean of their positions
+def _rank(values):
+    order = np.argsort(values, kind="mergesort")
+    _, inverse, counts = np.unique(
+        values[order], return_inverse=True, return_counts=True
+    )
+    starts = np.cumsum(counts) - counts
+    ranks = np.empty(len(values), dtype=np.float64)
+    ranks[order] = (starts + (counts - 1) / 2.0)[inverse]
+    return ranks
+
+
+def _pearson(x, y):
+    x = x - x.mean()
+    y = y - y.mean()
+    denom = np.sqrt(np.dot(x, x) * np.dot(y, y))
+    return np.dot(x, y) / denom if denom else np.nan
+
+
+# Name: pair_concordance
+# Process: agreement of two replicates over the peptides scored in both:
+# Pearson and Spearman correlation, fraction of peptides at or above thresh in
+# both replicates, and the reduced major axis slope of y on x (symmetric in
+# the two replicates, unlike a least squares fit)
+# Method Input/Parameters: x, y (score arrays), thresh
+# Method output/Returned: list of values in the order of COLUMNS
+def pair_concordance(x, y, thresh):
+    present = np.isfinite(x) & np.isfinite(y)
+    x = x[present].astype(np.float64)
+    y = y[present].astype(np.float64)
+    if len(x) < 2:
+        return [np.nan] * len(COLUMNS)
+    pearson = _pearson(x, y)
+    spearman = _pearson(_rank(x), _rank(y))
+    both_above = np.count_nonzero((x >= thresh) & (y >= thresh)) / len(x)
+    sd_x = x.std()
+    slope = np.sign(pearson) * y.std() / sd_x if sd_x else np.nan
+    return [pearson, spearman, both_above, slope]
+
+
+# Name: concordance_table
+# Process: concordance of every replicate pair of every source group, for the
+# z scores and for log10 col-sum (the data behind the z score and col-sum
+# scatter plots)
+# Method Input/Parameters: zscores, col_sum (PeptideMatrix), groups (dict of
+# group name -> sample names), z_thresh, cs_thresh (compared with col-sum
+# before the log transform)
+# Method output/Returned: header, list of rows
+def concordance_table(zscores, col_sum, groups, z_thresh, cs_thresh):
+    log_thresh = np.log10(max(cs_thresh, 0) + 1)
+    header = ["Source", "sample_1", "sample_2"] \
+        + ["z_%s" % (column) for column in COLUMNS] \
+        + ["cs_%s" % (column) for column in COLUMNS]
+    rows = []
+    for group, samples in groups.items():
+        z = zscores.columns(samples)
+        cs = np.log10(np.clip(col_sum.columns(samples), 0, None) + 1)
+        for i, j in combinations(range(len(samples)), 2):
+            rows.append(
+                [group, samples[i], samples[j]]
+                + pair_concordance(z[:, i], z[:, j], z_thresh)
+                + pair_concordance(cs[:, i], cs[:, j], log_thresh)
+            )
+    return header, rows
+
+
+# Name: write_concordance
+# Process: writes the replicate concordance table as a tsv
+# Method Input/Parameters: filepath, header, rows
+# Method output/Returned: None
+def write_concordance(filepath, header, rows):
+    with open(filepath, "w") as fh:
+        fh.write("\t".join(header) + "\n")
+        for row in rows:
+            fh.write("\t".join(
+                value if isinstance(value, str) else "%.4f" % (value)
+                for value in row
+            ) + "\n")
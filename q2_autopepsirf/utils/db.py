@@ -0,0 +1,237 @@
+from itertools import repeat
+
+import numpy as np
+import sqlite3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    added TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS samples (
+    sample_id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS peptides (
+    peptide_id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS enriched (
+    peptide_id INTEGER NOT NULL,
+    run_id INTEGER NOT NULL,
+    sample_id INTEGER NOT NULL,
+    PRIMARY KEY (peptide_id, run_id, sample_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS enriched_by_sample
+    ON enriched (run_id, sample_id);
+CREATE TABLE IF NOT EXISTS scores (
+    run_id INTEGER NOT NULL,
+    sample_id INTEGER NOT NULL,
+    peptide_id INTEGER NOT NULL,
+    col_sum REAL,
+    zscore REAL,
+    PRIMARY KEY (run_id, sample_id, peptide_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS scores_by_peptide
+    ON scores (peptide_id);
+"""
+
+# tables holding rows of a run, cleared when a run is added again
+RUN_TABLES = ("enriched", "scores")
+
+
+# Name: connect
+# Process: opens (and creates if needed) a results database. WAL journaling
+# lets lookups run while a run is being added.
+# Method Input/Parameters: filepath
+# Method output/Returned: sqlite3 connection
+def connect(filepath):
+    conn = sqlite3.connect(filepath)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+# Name: intern
+# Process: ids of the given names in a name table (samples or peptides),
+# adding the names that are not in it yet
+# Method Input/Parameters: conn, table, names
+# Method output/Returned: dict of name -> id
+def intern(conn, table, names):
+    names = list(dict.fromkeys(names))
+    conn.executemany(
+        "INSERT OR IGNORE INTO %s (name) VALUES (?)" % (table),
+        ((name,) for name in names)
+    )
+    ids = {}
+    id_column = table[:-1] + "_id"
+    for start in range(0, len(names), 500):
+        chunk = names[start:start + 500]
+        ids.update(conn.execute(
+            "SELECT name, %s FROM %s WHERE name IN (%s)"
+            % (id_column, table, ",".join("?" * len(chunk))),
+            chunk
+        ))
+    return ids
+
+
+# Name: add_run
+# Process: registers a run by name. Adding a run that is already present
+# replaces its rows, so a re-run can be added again.
+# Method Input/Parameters: conn, name
+# Method output/Returned: run id
+def add_run(conn, name):
+    row = conn.execute(
+        "SELECT run_id FROM runs WHERE name = ?", (name,)
+    ).fetchone()
+    if row is None:
+        return conn.execute(
+            "INSERT INTO runs (name) VALUES (?)", (name,)
+        ).lastrowid
+    for table in RUN_TABLES:
+        conn.execute("DELETE FROM %s WHERE run_id = ?" % (table), row)
+    conn.execute(
+        "UPDATE runs SET added = CURRENT_TIMESTAMP WHERE run_id = ?", row
+    )
+    return row[0]
+
+
+def _insert_enriched(conn, run_id, enriched):
+    sample_ids = intern(conn, "samples", enriched)
+    peptide_ids = intern(
+        conn, "peptides",
+        (peptide for peptides in enriched.values() for peptide in peptides)
+    )
+    postings = sorted([
+        (peptide_ids[peptide], run_id, sample_ids[sample])
+        for sample, peptides in enriched.items()
+        for peptide in set(peptides)
+    ])
+    conn.executemany(
+        "INSERT INTO enriched (peptide_id, run_id, sample_id)"
+        " VALUES (?, ?, ?)", postings
+    )
+    return len(postings)
+
+
+def _insert_scores(conn, run_id, col_sum, zscores):
+    cs_rows = col_sum.peptides.encode(zscores.peptides, add=False)
+    if (cs_rows < 0).any():
+        raise ValueError("The col-sum and z score matrices do not contain the"
+            " same peptides.")
+    sample_ids = intern(conn, "samples", zscores.samples)
+    peptide_ids = intern(conn, "peptides", zscores.peptides)
+
+    # rows are inserted in primary key order, one sample column at a time
+    db_ids = np.array(
+        [peptide_ids[peptide] for peptide in zscores.peptides],
+        dtype=np.int64
+    )
+    order = np.argsort(db_ids, kind="stable")
+    sorted_ids = db_ids[order].tolist()
+    n_rows = 0
+    for sample in sorted(zscores.samples, key=sample_ids.get):
+        z = zscores.column(sample).astype(np.float64)[order]
+        cs = col_sum.column(sample).astype(np.float64)[cs_rows][order]
+        # NaN scores are stored as NULL
+        conn.executemany(
+            "INSERT INTO scores (run_id, sample_id, peptide_id, col_sum,"
+            " zscore) VALUES (?, ?, ?, ?, ?)",
+            zip(
+                repeat(run_id), repeat(sample_ids[sample]), sorted_ids,
+                np.where(np.isnan(cs), None, cs).tolist(),
+                np.where(np.isnan(z), None, z).tolist()
+            )
+        )
+        n_rows += len(sorted_ids)
+    return n_rows
+
+
+# Name: add_enriched
+# Process: adds the enriched peptides of every sample of a run to the
+# inverted peptide -> (run, sample) index, in one transaction. Postings are
+# inserted in primary key order so the index is appended to in order.
+# Method Input/Parameters: conn, run_name, enriched (dict of sample name ->
+# list of peptide names)
+# Method output/Returned: number of postings added
+def add_enriched(conn, run_name, enriched):
+    with conn:
+        return _insert_enriched(conn, add_run(conn, run_name), enriched)
+
+
+# Name: ingest_run
+# Process: adds the col-sum and z scores of every (sample, peptide) of a run,
+# and its enriched peptides, to the results warehouse in one transaction.
+# Rows are bulk inserted in primary key order.
+# Method Input/Parameters: conn, run_name, col_sum, zscores (PeptideMatrix),
+# enriched (dict of sample name -> list of peptide names)
+# Method output/Returned: number of score rows, number of postings
+def ingest_run(conn, run_name, col_sum, zscores, enriched):
+    with conn:
+        run_id = add_run(conn, run_name)
+        return (
+            _insert_scores(conn, run_id, col_sum, zscores),
+            _insert_enriched(conn, run_id, enriched)
+        )
+
+
+# Name: lookup_peptide
+# Process: runs and samples in which a peptide was enriched
+# Method Input/Parameters: conn, peptide
+# Method output/Returned: list of (run name, sample name)
+def lookup_peptide(conn, peptide):
+    return conn.execute(
+        "SELECT runs.name, samples.name FROM enriched"
+        " JOIN peptides USING (peptide_id)"
+        " JOIN runs USING (run_id)"
+        " JOIN samples USING (sample_id)"
+        " WHERE peptides.name = ?"
+        " ORDER BY runs.name, samples.name",
+        (peptide,)
+    ).fetchall()
+
+
+# Name: lookup_sample
+# Process: peptides enriched in a sample of a run
+# Method Input/Parameters: conn, run_name, sample
+# Method output/Returned: list of peptide names
+def lookup_sample(conn, run_name, sample):
+    return [name for name, in conn.execute(
+        "SELECT peptides.name FROM enriched"
+        " JOIN peptides USING (peptide_id)"
+        " WHERE run_id = (SELECT run_id FROM runs WHERE name = ?)"
+        " AND sample_id = (SELECT sample_id FROM samples WHERE name = ?)"
+        " ORDER BY peptides.name",
+        (run_name, sample)
+    )]
+
+
+# Name: peptide_scores
+# Process: col-sum and z score of a peptide in every sample of every run
+# Method Input/Parameters: conn, peptide
+# Method output/Returned: list of (run name, sample name, col-sum, z score)
+def peptide_scores(conn, peptide):
+    return conn.execute(
+        "SELECT runs.name, samples.name, col_sum, zscore FROM scores"
+        " JOIN runs USING (run_id)"
+        " JOIN samples USING (sample_id)"
+        " WHERE peptide_id = (SELECT peptide_id FROM peptides WHERE name = ?)"
+        " ORDER BY runs.name, samples.name",
+        (peptide,)
+    ).fetchall()
+
+
+# Name: sample_scores
+# Process: col-sum and z score of every peptide of a sample of a run
+# Method Input/Parameters: conn, run_name, sample
+# Method output/Returned: list of (peptide name, col-sum, z score)
+def sample_scores(conn, run_name, sample):
+    return conn.execute(
+        "SELECT peptides.name, col_sum, zscore FROM scores"
+        " JOIN peptides USING (peptide_id)"
+        " WHERE run_id = (SELECT run_id FROM runs WHERE name = ?)"
+        " AND sample_id = (SELECT sample_id FROM samples WHERE name = ?)",
+        (run_name, sample)
+    ).fetchall()
@@ -0,0 +1,59 @@
+from q2_autopepsirf.utils.ingest import link_or_copy
+from q2_autopepsirf.utils.merge import merge_dirs
+
+import json
+import os
+
+MANIFEST = "manifest.json"
+
+# visualizations of a diffEnrich run that can be deferred
+VISUALIZATIONS = (
+    "rc_boxplot", "enrich_count_boxplot", "zscore_scatter", "colsum_scatter",
+    "zenrich_scatter"
+)
+
+
+# Name: write_render_data
+# Process: stores what the visualizations of a run are built from in run_dir:
+# the files are linked (not copied) into it and the render parameters are
+# written to a json manifest
+# Method Input/Parameters: run_dir, files (dict of name -> file or directory
+# path, None entries are skipped), params (json serializable dict)
+# Method output/Returned: absolute path of run_dir
+def write_render_data(run_dir, files, params):
+    run_dir = os.path.abspath(run_dir)
+    os.makedirs(run_dir, exist_ok=True)
+    stored = {}
+    for name, path in files.items():
+        if path is None:
+            continue
+        dest = os.path.join(run_dir, name)
+        if os.path.isdir(path):
+            merge_dirs([path], dest)
+        else:
+            link_or_copy(path, dest)
+        stored[name] = name
+
+    with open(os.path.join(run_dir, MANIFEST), "w") as fh:
+        json.dump({"files": stored, "params": params}, fh, indent=2)
+    return run_dir
+
+
+# Name: read_render_data
+# Process: reads the manifest of a run directory written by write_render_data
+# Method Input/Parameters: run_dir
+# Method output/Returned: dict of name -> absolute path, params dict
+def read_render_data(run_dir):
+    manifest = os.path.join(run_dir, MANIFEST)
+    if not os.path.isfile(manifest):
+        raise ValueError(
+            "%s is not a deferred diffEnrich run directory, %s is missing."
+            % (run_dir, MANIFEST)
+        )
+    with open(manifest) as fh:
+        data = json.load(fh)
+    files = {
+        name: os.path.join(run_dir, stored)
+        for name, stored in data["files"].items()
+    }
+    return files, data["params"]
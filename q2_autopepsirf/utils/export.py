@@ -0,0 +1,99 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from q2_autopepsirf.utils.threads import available_cpus
+
+import bz2
+import gzip
+import lzma
+import os
+
+# size of the independently compressed blocks. Concatenated gzip members,
+# bz2 streams and xz streams are all valid files for the standard readers.
+BLOCK_SIZE = 4 * 1024 * 1024
+
+COMPRESSORS = {
+    "gzip": (partial(gzip.compress, compresslevel=6, mtime=0), ".gz"),
+    "bz2": (bz2.compress, ".bz2"),
+    "xz": (lzma.compress, ".xz")
+}
+
+
+# Name: enrich_base
+# Process: name of the exported enriched peptide directory, built from the
+# enrichment thresholds (Ex: "6-10Z-HDI95_20CS_300000raw")
+# Method Input/Parameters: exact_z_thresh, exact_cs_thresh, hdi,
+# raw_constraint
+# Method output/Returned: directory name
+def enrich_base(exact_z_thresh, exact_cs_thresh, hdi, raw_constraint):
+    if not exact_z_thresh:
+        return "enriched"
+
+    enrich_zt = exact_z_thresh.split(",")
+    enrich_cst = exact_cs_thresh.split(",")
+    if len(enrich_zt) > 1:
+        base = "%s-%sZ-HDI%s_" % (
+            enrich_zt[0], enrich_zt[1], str(int(hdi * 100))
+        )
+    else:
+        base = "%sZ-HDI%s_" % (enrich_zt[0], str(int(hdi * 100)))
+    if len(enrich_cst) > 1:
+        base += "%s-%sCS_%sraw" % (
+            enrich_cst[0], enrich_cst[1], str(raw_constraint)
+        )
+    else:
+        base += "%sCS_%sraw" % (enrich_cst[0], str(raw_constraint))
+    return base
+
+
+# Name: compress_file
+# Process: streams src into dest, compressing fixed size blocks in a thread
+# pool (the standard library compressors release the GIL) and writing them in
+# order, so no uncompressed copy is ever written
+# Method Input/Parameters: src, dest, compression, n_threads
+# Method output/Returned: None
+def compress_file(src, dest, compression, n_threads=None):
+    compress = COMPRESSORS[compression][0]
+    n_threads = n_threads or available_cpus()
+
+    with open(src, "rb") as fin, open(dest, "wb") as fout, \
+            ThreadPoolExecutor(max_workers=n_threads) as pool:
+        pending = deque()
+        for block in iter(lambda: fin.read(BLOCK_SIZE), b""):
+            pending.append(pool.submit(compress, block))
+            # bound the number of blocks held in memory
+            if len(pending) > 2 * n_threads:
+                fout.write(pending.popleft().result())
+        while pending:
+            fout.write(pending.popleft().result())
+
+
+# Name: export_view
+# Process: saves a file or directory format view to path. Without compression
+# the format's own save is used, otherwise the artifact data file(s) are
+# compressed straight into path (plus the compression's extension).
+# Method Input/Parameters: view, path, ext, compression, n_threads
+# Method output/Returned: None
+def export_view(view, path, ext=None, compression=None, n_threads=None):
+    if not compression:
+        if ext:
+            view.save(path, ext=ext)
+        else:
+            view.save(path)
+        return
+
+    suffix = COMPRESSORS[compression][1]
+    src = str(view.path)
+    if os.path.isdir(src):
+        os.makedirs(path, exist_ok=True)
+        for name in sorted(os.listdir(src)):
+            compress_file(
+                os.path.join(src, name),
+                os.path.join(path, name + suffix),
+                compression,
+                n_threads
+            )
+    else:
+        if ext and not path.endswith(ext):
+            path += ext
+        compress_file(src, path + suffix, compression, n_threads)
@@ -0,0 +1,63 @@
+import numpy as np
+
+
+# Name: IdTable
+# Process: interns names (peptides or samples) as dense int32 ids assigned in
+# order of first appearance. In-process structures hold ids and names are only
+# looked up again when something is exported.
+# Method Input/Parameters: names (initial names, optional)
+class IdTable:
+    def __init__(self, names=()):
+        self.names = []
+        self._ids = {}
+        for name in names:
+            self.add(name)
+
+    def add(self, name):
+        id_ = self._ids.get(name)
+        if id_ is None:
+            id_ = self._ids[name] = len(self.names)
+            self.names.append(name)
+        return id_
+
+    def get(self, name, default=-1):
+        return self._ids.get(name, default)
+
+    # names not in the table are added unless add is False, in which case
+    # they are encoded as -1
+    def encode(self, names, add=True):
+        lookup = self.add if add else self.get
+        return np.fromiter(
+            (lookup(name) for name in names), dtype=np.int32
+        )
+
+    def decode(self, ids):
+        return [self.names[id_] for id_ in ids]
+
+    def __getitem__(self, id_):
+        return self.names[id_]
+
+    def __contains__(self, name):
+        return name in self._ids
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __len__(self):
+        return len(self.names)
+
+
+# Name: read_bins
+# Process: reads a bins file (one tab-delimited bin of peptides per line) as
+# arrays of peptide ids
+# Method Input/Parameters: filepath, peptide_ids (IdTable), add (add unknown
+# peptides to the table, otherwise they are encoded as -1)
+# Method output/Returned: list of int32 arrays, one per bin
+def read_bins(filepath, peptide_ids, add=False):
+    bins = []
+    with open(filepath) as fh:
+        for line in fh:
+            peptides = [pep for pep in line.rstrip("\r\n").split("\t") if pep]
+            if peptides:
+                bins.append(peptide_ids.encode(peptides, add=add))
+    return bins
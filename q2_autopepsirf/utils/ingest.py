@@ -0,0 +1,75 @@
+import fcntl
+import os
+import shutil
+
+# ioctl request used by btrfs/xfs (and others) to clone a file's extents
+FICLONE = 0x40049409
+
+
+# Name: check_header
+# Process: reads only the first line of a tsv file to catch missing, empty or
+# non tab-delimited files before anything is imported
+# Method Input/Parameters: filepath, min_fields
+# Method output/Returned: list of header fields
+def check_header(filepath, min_fields=1):
+    with open(filepath) as fh:
+        header = fh.readline().rstrip("\r\n")
+
+    fields = header.split("\t")
+    if not header or len(fields) < min_fields:
+        raise ValueError(
+            "%s does not look like a tab-delimited file: expected at least %d"
+            " column(s) in the first line, found %d."
+            % (filepath, min_fields, len(fields) if header else 0)
+        )
+    return fields
+
+
+# Name: link_or_copy
+# Process: places src at dst without duplicating its data when possible. A
+# reflink (copy-on-write clone) is tried first, then a hardlink, both of which
+# need src and dst on the same filesystem. Otherwise the file is copied.
+# Method Input/Parameters: src, dst
+# Method output/Returned: "reflink", "hardlink" or "copy"
+def link_or_copy(src, dst):
+    if os.path.lexists(dst):
+        os.remove(dst)
+
+    try:
+        with open(src, "rb") as fin, open(dst, "wb") as fout:
+            fcntl.ioctl(fout.fileno(), FICLONE, fin.fileno())
+        return "reflink"
+    except OSError:
+        if os.path.exists(dst):
+            os.remove(dst)
+
+    try:
+        os.link(src, dst)
+        return "hardlink"
+    except OSError:
+        pass
+
+    shutil.copyfile(src, dst)
+    return "copy"
+
+
+# Name: import_tsv
+# Process: imports a tsv file into an artifact. The header is checked first
+# so a malformed file fails before anything is staged, then the file is linked
+# (not copied) into qiime2's working directory so qiime2 can in turn link it
+# into the artifact's data directory. qiime2 still validates the staged file
+# with its format when the artifact is made.
+# Method Input/Parameters: ctx, semantic_type, filepath, view_type, min_fields
+# Method output/Returned: the imported artifact
+def import_tsv(ctx, semantic_type, filepath, view_type, min_fields=1):
+    check_header(filepath, min_fields)
+
+    # an empty format is created inside qiime2's temporary directory
+    staged = view_type()
+    link_or_copy(filepath, str(staged))
+
+    return ctx.make_artifact(
+        type=semantic_type,
+        view=staged,
+        view_type=view_type
+    )
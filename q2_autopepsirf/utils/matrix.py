@@ -0,0 +1,262 @@
+from concurrent.futures import ProcessPoolExecutor
+from q2_pepsirf.format_types import PepsirfContingencyTSVFormat
+from q2_autopepsirf.utils.ids import IdTable
+from q2_autopepsirf.utils.threads import available_cpus
+
+import io
+import numpy as np
+import os
+import pandas as pd
+
+# smallest byte range handed to a reader worker
+MIN_CHUNK_BYTES = 1024 * 1024
+
+
+# Name: split_lines
+# Process: splits the byte range [start, size) of a file into about n_chunks
+# ranges that all begin at the start of a line
+# Method Input/Parameters: filepath, start, n_chunks
+# Method output/Returned: list of (start, end) byte offsets
+def split_lines(filepath, start, n_chunks):
+    size = os.path.getsize(filepath)
+    step = max(MIN_CHUNK_BYTES, (size - start) // max(1, n_chunks) + 1)
+    bounds = [start]
+    with open(filepath, "rb") as fh:
+        while bounds[-1] + step < size:
+            fh.seek(bounds[-1] + step)
+            fh.readline()
+            if fh.tell() >= size:
+                break
+            bounds.append(fh.tell())
+    bounds.append(size)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def _read_range(filepath, start, end, n_samples, dtype):
+    with open(filepath, "rb") as fh:
+        fh.seek(start)
+        data = fh.read(end - start)
+    frame = pd.read_csv(
+        io.BytesIO(data), sep="\t", header=None, index_col=0,
+        dtype={i: (str if i == 0 else dtype) for i in range(n_samples + 1)}
+    )
+    return frame.index.tolist(), frame.to_numpy(dtype=dtype)
+
+
+# Name: read_tsv_parallel
+# Process: reads a pepsirf matrix by splitting it at line boundaries into byte
+# ranges that are parsed in parallel worker processes with a fixed dtype
+# (Ex: int32 raw counts, float32 normalized scores), then concatenated
+# Method Input/Parameters: filepath, dtype, n_workers
+# Method output/Returned: values array, peptide names, sample names, index name
+def read_tsv_parallel(filepath, dtype=np.float32, n_workers=1):
+    with open(filepath, "rb") as fh:
+        header = fh.readline().decode().rstrip("\r\n").split("\t")
+        start = fh.tell()
+
+    # a matrix with a header but no rows has a single empty range
+    ranges = [
+        (s, e) for s, e in split_lines(filepath, start, 4 * n_workers)
+        if e > s
+    ]
+    args = [
+        (filepath, s, e, len(header) - 1, dtype) for s, e in ranges
+    ]
+    if n_workers <= 1 or len(ranges) <= 1:
+        parts = [_read_range(*arg) for arg in args]
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            parts = list(pool.map(_read_range, *zip(*args)))
+
+    peptides = [pep for names, _ in parts for pep in names]
+    if parts:
+        values = np.concatenate([vals for _, vals in parts])
+    else:
+        values = np.empty((0, len(header) - 1), dtype=dtype)
+    return values, peptides, header[1:], header[0]
+
+
+# Name: format_fixed
+# Process: vectorized equivalent of "%.<precision>f" for a 2-D block of floats.
+# Values are scaled to integers, their digits are laid out in fixed width
+# fields of a byte array, and the padding bytes are dropped in one pass.
+# Method Input/Parameters: values (2-D array), precision, sep (byte placed
+# after every value but the last of a row), row_prefix (2-D uint8 array of
+# NUL padded bytes written before each row, optional)
+# Method output/Returned: bytes of the formatted rows, newline terminated
+def format_fixed(values, precision, sep=b"\t", row_prefix=None):
+    values = np.asarray(values, dtype=np.float64)
+    rows, cols = values.shape
+    finite = np.isfinite(values)
+    scaled = np.abs(np.where(finite, values, 0.0)) * 10 ** precision
+    ints = np.rint(scaled).astype(np.int64)
+
+    # an exact .5 after scaling may hide which side of the midpoint the value
+    # was on, so those (rare) values are rounded by "%f" itself
+    ties = np.flatnonzero(scaled - np.floor(scaled) == 0.5)
+    for i in ties:
+        text = "%.*f" % (precision, abs(values.flat[i]))
+        ints.flat[i] = int(text.replace(".", ""))
+
+    # number of digits of the largest value, room for "-inf" and "nan"
+    n_digits = max(len(str(int(ints.max()))) if ints.size else 1,
+                   precision + 1, 4)
+    int_digits = n_digits - precision
+    dot = 1 if precision else 0
+    width = 1 + n_digits + dot + 1
+
+    digits = np.empty((rows, cols, n_digits), dtype=np.uint8)
+    remaining = ints.copy()
+    for pos in range(n_digits - 1, -1, -1):
+        digits[..., pos] = remaining % 10 + 48
+        remaining //= 10
+
+    # significant digits of each value, at least one before the point
+    used = precision + 1 + sum(
+        (ints >= 10 ** k).astype(np.int64)
+        for k in range(precision + 1, n_digits)
+    )
+    leading = np.arange(n_digits) < (n_digits - used)[..., None]
+    digits[leading] = 0
+
+    out = np.zeros((rows, cols, width), dtype=np.uint8)
+    out[..., 0] = np.where(np.signbit(values) & finite, ord("-"), 0)
+    out[..., 1:1 + int_digits] = digits[..., :int_digits]
+    if precision:
+        out[..., 1 + int_digits] = ord(".")
+        out[..., 2 + int_digits:width - 1] = digits[..., int_digits:]
+    out[..., width - 1] = sep[0]
+    out[:, -1, width - 1] = ord("\n")
+
+    # nan and inf are spelled out the way "%f" does
+    for text, mask in (
+            (b"nan", np.isnan(values)),
+            (b"inf", np.isposinf(values)),
+            (b"-inf", np.isneginf(values))):
+        if mask.any():
+            field = np.zeros(width - 1, dtype=np.uint8)
+            field[:len(text)] = np.frombuffer(text, dtype=np.uint8)
+            out[mask, :width - 1] = field
+
+    out = out.reshape(rows, cols * width)
+    if row_prefix is not None:
+        out = np.concatenate([row_prefix, out], axis=1)
+    out = out.ravel()
+    return out[out != 0].tobytes()
+
+
+# Name: write_tsv
+# Process: writes a PeptideMatrix as a pepsirf tsv with fixed precision,
+# formatting blocks of rows with format_fixed and writing them through a large
+# buffer
+# Method Input/Parameters: matrix (PeptideMatrix), filepath, precision,
+# chunk_cells (approximate number of values formatted at once)
+# Method output/Returned: None
+def write_tsv(matrix, filepath, precision=2, chunk_cells=4000000):
+    n_rows, n_cols = matrix.shape
+    chunk_rows = max(1, chunk_cells // max(1, n_cols))
+    header = "\t".join([matrix.index_name] + matrix.samples.names) + "\n"
+
+    with open(filepath, "wb", buffering=16 * 1024 * 1024) as fh:
+        fh.write(header.encode())
+        for start in range(0, n_rows, chunk_rows):
+            stop = min(n_rows, start + chunk_rows)
+            names = np.array(
+                [name.encode() + b"\t"
+                 for name in matrix.peptides.names[start:stop]],
+                dtype=bytes
+            )
+            prefix = names.view(np.uint8).reshape(len(names), -1)
+            fh.write(format_fixed(
+                matrix.values[start:stop], precision, row_prefix=prefix
+            ))
+
+
+# Name: PeptideMatrix
+# Process: in-memory peptide x sample matrix handed between the in-process
+# stages of a run. Values stay binary (no float formatting or rounding) and
+# text is only produced when a tsv is actually exported. Rows and columns are
+# addressed by the int32 ids of the peptide and sample IdTables.
+# Method Input/Parameters: values (2-D array, peptides as rows), peptides,
+# samples (names or IdTables)
+class PeptideMatrix:
+    def __init__(self, values, peptides, samples, index_name="Sequence name"):
+        self.values = values
+        self.peptides = (
+            peptides if isinstance(peptides, IdTable) else IdTable(peptides)
+        )
+        self.samples = (
+            samples if isinstance(samples, IdTable) else IdTable(samples)
+        )
+        self.index_name = index_name
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes
+
+    # column ids of the given samples, unknown samples raise a KeyError
+    def sample_ids(self, samples):
+        ids = self.samples.encode(samples, add=False)
+        if (ids < 0).any():
+            raise KeyError(
+                "Samples not in matrix: %s"
+                % (", ".join(s for s, i in zip(samples, ids) if i < 0))
+            )
+        return ids
+
+    def columns(self, samples):
+        return self.values[:, self.sample_ids(samples)]
+
+    def column(self, sample):
+        return self.values[:, self.sample_ids([sample])[0]]
+
+    def to_frame(self):
+        frame = pd.DataFrame(
+            self.values, index=self.peptides.names,
+            columns=self.samples.names
+        )
+        frame.index.name = self.index_name
+        return frame
+
+    @classmethod
+    def from_frame(cls, frame):
+        return cls(
+            frame.to_numpy(), frame.index, frame.columns,
+            index_name=frame.index.name or "Sequence name"
+        )
+
+    @classmethod
+    def from_tsv(cls, filepath, dtype=np.float32, n_workers=1):
+        values, peptides, samples, index_name = read_tsv_parallel(
+            filepath, dtype=dtype, n_workers=n_workers
+        )
+        return cls(values, peptides, samples, index_name=index_name)
+
+    def to_tsv(self, filepath, precision=None):
+        if precision is None:
+            self.to_frame().to_csv(filepath, sep="\t")
+        else:
+            write_tsv(self, filepath, precision=precision)
+
+
+# Name: matrix_view
+# Process: parses a matrix artifact once per run, through the run's view cache,
+# so every in-process stage shares the same binary matrix. Raw counts should be
+# read as int32, normalized scores as float32.
+# Method Input/Parameters: views (ViewCache), artifact, dtype, n_workers
+# (defaults to the view cache's workers)
+# Method output/Returned: PeptideMatrix
+def matrix_view(views, artifact, dtype=np.float32, n_workers=None):
+    n_workers = n_workers or views.n_workers or available_cpus()
+    return views.load(
+        artifact, (PeptideMatrix, np.dtype(dtype).str),
+        lambda a: PeptideMatrix.from_tsv(
+            str(views.view(a, PepsirfContingencyTSVFormat)),
+            dtype=dtype,
+            n_workers=n_workers
+        )
+    )
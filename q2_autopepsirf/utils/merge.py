@@ -0,0 +1,252 @@
+from collections import Counter
+from itertools import groupby, islice, zip_longest
+from q2_autopepsirf.utils.ingest import link_or_copy
+
+import heapq
+import os
+import pandas as pd
+import tempfile
+
+
+def _read_text_matrix(path):
+    return pd.read_csv(
+        path, sep="\t", index_col=0, dtype=str, keep_default_na=False
+    )
+
+
+def _peptide(line):
+    return line.split("\t", 1)[0]
+
+
+def _check_samples(headers):
+    samples = [sample for header in headers for sample in header[1:]]
+    dupes = [s for s, n in Counter(samples).items() if n > 1]
+    if dupes:
+        raise ValueError(
+            "Samples found in more than one matrix: %s" % (", ".join(dupes))
+        )
+    return samples
+
+
+# Name: merge_columns
+# Process: joins the sample columns of several pepsirf matrices with the same
+# peptides into one matrix. Lines are joined as text, so values are copied
+# exactly and only one line per file is held in memory. If the peptide order
+# differs between files, the files are aligned on peptide name instead.
+# Method Input/Parameters: paths, dest
+# Method output/Returned: None
+def merge_columns(paths, dest):
+    handles = [open(path) for path in paths]
+    try:
+        headers = [fh.readline().rstrip("\r\n").split("\t") for fh in handles]
+        samples = _check_samples(headers)
+
+        with open(dest, "w") as out:
+            out.write("\t".join([headers[0][0]] + samples) + "\n")
+            for lines in zip_longest(*handles):
+                if None in lines:
+                    raise LookupError
+                fields = [line.rstrip("\r\n").split("\t", 1) for line in lines]
+                if len({field[0] for field in fields}) != 1:
+                    raise LookupError
+                out.write("\t".join(
+                    [fields[0][0]] + [field[1] for field in fields]
+                ) + "\n")
+    except LookupError:
+        _merge_aligned(paths, dest)
+    finally:
+        for fh in handles:
+            fh.close()
+
+
+def _merge_aligned(paths, dest):
+    frames = [_read_text_matrix(path) for path in paths]
+    peptides = set(frames[0].index)
+    for path, frame in zip(paths[1:], frames[1:]):
+        if set(frame.index) != peptides:
+            raise ValueError(
+                "%s does not contain the same peptides as %s"
+                % (path, paths[0])
+            )
+    merged = pd.concat(
+        [frames[0]] + [frame.loc[frames[0].index] for frame in frames[1:]],
+        axis=1
+    )
+    merged.to_csv(dest, sep="\t")
+
+
+# Name: is_sorted
+# Process: checks by streaming whether the rows of a matrix are sorted by
+# peptide name
+# Method Input/Parameters: path
+# Method output/Returned: bool
+def is_sorted(path):
+    with open(path) as fh:
+        fh.readline()
+        previous = None
+        for line in fh:
+            peptide = _peptide(line)
+            if previous is not None and peptide < previous:
+                return False
+            previous = peptide
+    return True
+
+
+# Name: external_sort
+# Process: sorts the rows of a matrix by peptide name in bounded memory.
+# chunk_rows rows at a time are sorted in memory and written to temporary
+# files in tmpdir, which are then merged with a heap.
+# Method Input/Parameters: path, dest, chunk_rows, tmpdir
+# Method output/Returned: None
+def external_sort(path, dest, chunk_rows=1000000, tmpdir=None):
+    runs = []
+    try:
+        with open(path) as fh:
+            header = fh.readline()
+            while True:
+                chunk = [
+                    line.rstrip("\r\n") + "\n"
+                    for line in islice(fh, chunk_rows) if line.strip()
+                ]
+                if not chunk:
+                    break
+                chunk.sort(key=_peptide)
+                run = tempfile.NamedTemporaryFile(
+                    "w", dir=tmpdir, suffix=".tsv", delete=False
+                )
+                with run:
+                    run.writelines(chunk)
+                runs.append(run.name)
+
+        handles = [open(run) for run in runs]
+        try:
+            with open(dest, "w") as out:
+                out.write(header.rstrip("\r\n") + "\n")
+                out.writelines(heapq.merge(*handles, key=_peptide))
+        finally:
+            for fh in handles:
+                fh.close()
+    finally:
+        for run in runs:
+            os.remove(run)
+
+
+def _sorted_rows(fh, index):
+    for line in fh:
+        if line.strip():
+            fields = line.rstrip("\r\n").split("\t", 1)
+            yield fields[0], index, fields[1] if len(fields) > 1 else ""
+
+
+# Name: kway_merge
+# Process: outer joins the sample columns of many matrices on peptide name in
+# bounded memory. Inputs that are not sorted by peptide are sorted externally
+# first, then all inputs are streamed through a k-way heap merge so only one
+# row per input is held in memory. Values are copied as text, peptides
+# missing from an input are written as nan. Output rows are sorted by
+# peptide name.
+# Method Input/Parameters: paths, dest, chunk_rows (rows held in memory by
+# the external sort), tmpdir
+# Method output/Returned: None
+def kway_merge(paths, dest, chunk_rows=1000000, tmpdir=None):
+    sorted_paths, temporary = [], []
+    try:
+        for path in paths:
+            if is_sorted(path):
+                sorted_paths.append(path)
+                continue
+            sorted_path = tempfile.NamedTemporaryFile(
+                dir=tmpdir, suffix=".tsv", delete=False
+            ).name
+            temporary.append(sorted_path)
+            external_sort(path, sorted_path, chunk_rows, tmpdir)
+            sorted_paths.append(sorted_path)
+
+        handles = [open(path) for path in sorted_paths]
+        try:
+            headers = [
+                fh.readline().rstrip("\r\n").split("\t") for fh in handles
+            ]
+            samples = _check_samples(headers)
+            missing = ["\t".join(["nan"] * (len(h) - 1)) for h in headers]
+
+            with open(dest, "w") as out:
+                out.write("\t".join([headers[0][0]] + samples) + "\n")
+                rows = heapq.merge(
+                    *(_sorted_rows(fh, i) for i, fh in enumerate(handles))
+                )
+                for peptide, group in groupby(rows, key=lambda row: row[0]):
+                    fields = list(missing)
+                    for _, index, values in group:
+                        fields[index] = values
+                    out.write("\t".join([peptide] + fields) + "\n")
+        finally:
+            for fh in handles:
+                fh.close()
+    finally:
+        for path in temporary:
+            os.remove(path)
+
+
+# Name: select_columns
+# Process: streams the given sample columns of a pepsirf matrix into dest,
+# copying the values as text
+# Method Input/Parameters: path, samples, dest
+# Method output/Returned: None
+def select_columns(path, samples, dest):
+    with open(path) as fh, open(dest, "w") as out:
+        header = fh.readline().rstrip("\r\n").split("\t")
+        lookup = {sample: i for i, sample in enumerate(header)}
+        missing = [sample for sample in samples if sample not in lookup]
+        if missing:
+            raise ValueError(
+                "Samples not found in %s: %s" % (path, ", ".join(missing))
+            )
+        keep = [0] + [lookup[sample] for sample in samples]
+        out.write("\t".join(header[i] for i in keep) + "\n")
+        for line in fh:
+            fields = line.rstrip("\r\n").split("\t")
+            out.write("\t".join(fields[i] for i in keep) + "\n")
+
+
+# Name: merge_dirs
+# Process: places the files of several directories into dest. Files are
+# linked when possible. A name found in more than one directory is an error,
+# unless concat(name) is true, in which case the files are concatenated in
+# directory order into a new file and a first line shared by all of them
+# (a header) is kept once
+# Method Input/Parameters: src_dirs, dest, concat (predicate on file names)
+# Method output/Returned: None
+def merge_dirs(src_dirs, dest, concat=None):
+    os.makedirs(dest, exist_ok=True)
+    sources = {}
+    for src in src_dirs:
+        for name in sorted(os.listdir(src)):
+            sources.setdefault(name, []).append(os.path.join(src, name))
+
+    for name, paths in sources.items():
+        target = os.path.join(dest, name)
+        if len(paths) == 1:
+            link_or_copy(paths[0], target)
+            continue
+        if concat is None or not concat(name):
+            raise ValueError(
+                "'%s' is in more than one of the merged directories: %s"
+                % (name, ", ".join(os.path.dirname(p) for p in paths))
+            )
+        firsts = set()
+        for path in paths:
+            with open(path, "rb") as fh:
+                firsts.add(fh.readline())
+        header = firsts.pop() if len(firsts) == 1 else None
+        if os.path.lexists(target):
+            os.remove(target)
+        with open(target, "wb") as out:
+            for i, path in enumerate(paths):
+                with open(path, "rb") as fh:
+                    if i and header is not None:
+                        fh.readline()
+                    data = fh.read()
+                    out.write(data)
+                    if data and not data.endswith(b"\n"):
+                        out.write(b"\n")
@@ -0,0 +1,157 @@
+from q2_autopepsirf.utils.ids import IdTable
+
+import numpy as np
+import pandas as pd
+
+# sample name of the single-column matrix handed to pepsirf's diff norm
+MEAN_SAMPLE = "negative_control_mean"
+
+
+# Name: summarize
+# Process: per-peptide count, mean and sample variance of a peptide x sample
+# block, ignoring NaN values
+# Method Input/Parameters: values (2-D array)
+# Method output/Returned: count, mean, variance arrays
+def summarize(values):
+    values = np.asarray(values, dtype=np.float64)
+    count = np.sum(~np.isnan(values), axis=1)
+    total = np.nansum(values, axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.where(count > 0, total / count, np.nan)
+        sq = np.nansum((values - mean[:, None]) ** 2, axis=1)
+        variance = np.where(count > 1, sq / (count - 1), np.nan)
+    return count, mean, variance
+
+
+# Name: select_controls
+# Process: picks the negative control columns out of a matrix header. All
+# samples are controls unless some are selected by name or id.
+# Method Input/Parameters: header (list of column names), negative_id,
+# negative_names, filepath (for error messages)
+# Method output/Returned: list of sample names
+def select_controls(header, negative_id=None, negative_names=None,
+                    filepath="negative control"):
+    samples = header[1:]
+    if negative_names:
+        missing = set(negative_names) - set(samples)
+        if missing:
+            raise ValueError(
+                "Negative control names not found in %s: %s"
+                % (filepath, ", ".join(sorted(missing)))
+            )
+        return list(negative_names)
+    if negative_id:
+        samples = [s for s in samples if s.startswith(negative_id)]
+        if not samples:
+            raise ValueError(
+                "No sample in %s starts with negative id '%s'."
+                % (filepath, negative_id)
+            )
+    return samples
+
+
+# Name: RunningStats
+# Process: per-peptide running count, mean and sum of squared deviations
+# (Welford's algorithm). Control columns are added one at a time, vectorized
+# over peptides, so memory is bounded by the number of peptides no matter how
+# many plates are pooled. Peptides are interned as ids in order of first
+# appearance and may differ between plates.
+class RunningStats:
+    def __init__(self):
+        self.peptides = IdTable()
+        self.count = np.zeros(0, dtype=np.int64)
+        self.mean = np.zeros(0, dtype=np.float64)
+        self.m2 = np.zeros(0, dtype=np.float64)
+
+    def _grow(self):
+        extra = len(self.peptides) - len(self.count)
+        if extra > 0:
+            self.count = np.concatenate(
+                [self.count, np.zeros(extra, dtype=np.int64)]
+            )
+            self.mean = np.concatenate([self.mean, np.zeros(extra)])
+            self.m2 = np.concatenate([self.m2, np.zeros(extra)])
+
+    # adds a peptide x sample block of control values, ignoring NaN
+    def update(self, peptides, values):
+        ids = self.peptides.encode(peptides)
+        self._grow()
+        values = np.asarray(values, dtype=np.float64)
+        for column in values.T:
+            present = ~np.isnan(column)
+            rows = ids[present]
+            x = column[present]
+            self.count[rows] += 1
+            delta = x - self.mean[rows]
+            self.mean[rows] += delta / self.count[rows]
+            self.m2[rows] += delta * (x - self.mean[rows])
+
+    def result(self):
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.where(self.count > 0, self.mean, np.nan)
+            variance = np.where(
+                self.count > 1, self.m2 / (self.count - 1), np.nan
+            )
+        return self.count, mean, variance
+
+
+# Name: pool_stats
+# Process: streams negative control matrices one at a time, chunksize rows at
+# a time, into a RunningStats
+# Method Input/Parameters: filepaths, negative_id, negative_names, chunksize
+# Method output/Returned: RunningStats
+def pool_stats(filepaths, negative_id=None, negative_names=None,
+               chunksize=50000):
+    stats = RunningStats()
+    for filepath in filepaths:
+        with open(filepath) as fh:
+            header = fh.readline().rstrip("\r\n").split("\t")
+        samples = select_controls(
+            header, negative_id, negative_names, filepath
+        )
+        # only the selected columns are parsed
+        reader = pd.read_csv(
+            filepath, sep="\t", index_col=0, usecols=[header[0]] + samples,
+            chunksize=chunksize
+        )
+        for chunk in reader:
+            stats.update(chunk.index.astype(str), chunk[samples].to_numpy())
+    return stats
+
+
+# Name: write_stats
+# Process: writes the per-peptide statistics in NegativeControlStatsFormat
+# Method Input/Parameters: filepath, peptides, mean, count, variance
+# Method output/Returned: None
+def write_stats(filepath, peptides, mean, count, variance):
+    with open(filepath, "w") as fh:
+        fh.write("Sequence name\tmean\tcount\tvariance\n")
+        for row in zip(peptides, mean, count, variance):
+            fh.write("%s\t%r\t%d\t%r\n" % (
+                row[0], float(row[1]), int(row[2]), float(row[3])
+            ))
+
+
+# Name: read_stats
+# Process: reads a NegativeControlStatsFormat file
+# Method Input/Parameters: filepath
+# Method output/Returned: pandas DataFrame indexed by peptide
+def read_stats(filepath):
+    frame = pd.read_csv(filepath, sep="\t", index_col=0)
+    frame.index = frame.index.astype(str)
+    return frame
+
+
+# Name: stats_to_control
+# Process: writes the per-peptide means as a single-sample pepsirf matrix.
+# The diff normalizations subtract the mean of the negative control samples,
+# and the mean of a single sample holding the means is the means themselves,
+# so this matrix can stand in for the full negative control matrix.
+# Method Input/Parameters: stats_path, dest
+# Method output/Returned: None
+def stats_to_control(stats_path, dest):
+    frame = read_stats(stats_path)
+    with open(dest, "w") as fh:
+        fh.write("Sequence name\t%s\n" % (MEAN_SAMPLE))
+        for peptide, mean in zip(frame.index, frame["mean"]):
+            fh.write("%s\t%r\n" % (peptide, float(mean)))
@@ -0,0 +1,65 @@
+from itertools import combinations
+from q2_autopepsirf.utils.matrix import PeptideMatrix
+from q2_autopepsirf.utils.shm import map_column_groups
+
+import numpy as np
+
+
+def _bin(values, grid_size):
+    low, high = values.min(), values.max()
+    if high == low:
+        return np.zeros(len(values), dtype=np.int64)
+    cells = ((values - low) / (high - low) * grid_size).astype(np.int64)
+    return np.minimum(cells, grid_size - 1)
+
+
+# Name: cell_representatives
+# Process: bins every pair of replicates of a group on a grid_size x
+# grid_size grid and keeps the first peptide of every occupied cell. Runs in
+# worker processes through map_column_groups.
+# Method Input/Parameters: values, columns (column ids of the replicates),
+# grid_size, log (bin log10 values, as in the col-sum scatter)
+# Method output/Returned: sorted array of row ids
+def cell_representatives(values, columns, grid_size, log=False):
+    block = values[:, columns].astype(np.float64)
+    if log:
+        block = np.log10(np.clip(block, 0, None) + 1)
+
+    keep = []
+    for i, j in combinations(range(len(columns)), 2):
+        x, y = block[:, i], block[:, j]
+        rows = np.flatnonzero(np.isfinite(x) & np.isfinite(y))
+        if not len(rows):
+            continue
+        cells = _bin(x[rows], grid_size) * grid_size + _bin(y[rows], grid_size)
+        _, first = np.unique(cells, return_index=True)
+        keep.append(rows[first])
+    if not keep:
+        return np.zeros(0, dtype=np.int64)
+    return np.unique(np.concatenate(keep))
+
+
+# Name: thin_scatter
+# Process: reduces a matrix to the peptides needed to draw its replicate
+# scatter plots: one representative per occupied grid cell of every replicate
+# pair, plus the given outlier peptides, which are always kept exactly. The
+# number of rows grows with the grid resolution instead of the number of
+# peptides.
+# Method Input/Parameters: matrix (PeptideMatrix), groups (lists of replicate
+# sample names), grid_size, outliers (peptide names), log, n_workers
+# Method output/Returned: PeptideMatrix with the kept rows, in original order
+def thin_scatter(matrix, groups, grid_size, outliers=(), log=False,
+                 n_workers=1):
+    groups = [group for group in groups if len(group) > 1]
+    rows = map_column_groups(
+        matrix, cell_representatives, groups, n_workers=n_workers,
+        extra=(grid_size, log)
+    )
+    outlier_rows = matrix.peptides.encode(outliers, add=False)
+    rows = np.unique(np.concatenate(
+        rows + [outlier_rows[outlier_rows >= 0].astype(np.int64)]
+    ))
+    return PeptideMatrix(
+        matrix.values[rows], matrix.peptides.decode(rows), matrix.samples,
+        index_name=matrix.index_name
+    )
@@ -0,0 +1,145 @@
+import atexit
+import os
+import shutil
+import stat
+import sys
+import tempfile
+
+# steps of a diffEnrich (and deconv) run: dependencies and relative cost
+STEPS = {
+    "col_sum": ((), 2),
+    "diff": (("col_sum",), 2),
+    "diff_ratio": (("col_sum",), 2),
+    "zscore": (("diff",), 10),
+    "sample_names": ((), 1),
+    "read_counts": ((), 1),
+    "enrich": (("zscore", "col_sum", "sample_names"), 4),
+    "deconv": (("enrich",), 10),
+    "rc_boxplot": (("read_counts",), 3),
+    "enrich_count_boxplot": (("enrich",), 3),
+    "zscore_scatter": (("zscore", "sample_names"), 5),
+    "colsum_scatter": (("col_sum", "sample_names"), 5),
+    "zenrich_scatter": (("zscore", "col_sum", "sample_names"), 5),
+}
+
+# steps run as pepsirf processes, whose priority can be set
+PEPSIRF_STEPS = (
+    "col_sum", "diff", "diff_ratio", "zscore", "sample_names", "read_counts",
+    "enrich", "deconv"
+)
+
+# nice value of the steps that are not on the critical path
+OFF_PATH_NICE = 10
+
+# wrapper executable: sets the nice value of its process, then replaces
+# itself with pepsirf, so the value applies to the pepsirf process only
+NICE_WRAPPER = """#!{python}
+import os
+import sys
+
+try:
+    os.nice({nice})
+except OSError:
+    pass
+os.execvp({binary!r}, [{binary!r}] + sys.argv[1:])
+"""
+
+_wrappers = {}
+
+
+# Name: upward_ranks
+# Process: length of the costliest path from every step to the end of the
+# run, including the step itself. Steps with a higher rank delay the run
+# more when they wait, so they are scheduled first.
+# Method Input/Parameters: steps (dict of step -> (dependencies, cost))
+# Method output/Returned: dict of step -> rank
+def upward_ranks(steps=STEPS):
+    dependents = {step: [] for step in steps}
+    for step, (deps, _) in steps.items():
+        for dep in deps:
+            dependents[dep].append(step)
+
+    ranks = {}
+
+    def rank(step):
+        if step not in ranks:
+            ranks[step] = steps[step][1] + max(
+                (rank(after) for after in dependents[step]), default=0
+            )
+        return ranks[step]
+
+    for step in steps:
+        rank(step)
+    return ranks
+
+
+# Name: critical_path
+# Process: the chain of steps that determines the total run time, following
+# the highest ranked step from the start of the run to its end
+# Method Input/Parameters: steps
+# Method output/Returned: list of steps
+def critical_path(steps=STEPS):
+    ranks = upward_ranks(steps)
+    path = []
+    candidates = [step for step, (deps, _) in steps.items() if not deps]
+    while candidates:
+        step = max(candidates, key=ranks.get)
+        path.append(step)
+        candidates = [
+            after for after, (deps, _) in steps.items() if step in deps
+        ]
+    return path
+
+
+# Name: step_nice
+# Process: nice value of every step: 0 on the critical path, OFF_PATH_NICE
+# elsewhere, unless overridden by step_priorities entries ("step=nice", Ex:
+# "diff_ratio=15")
+# Method Input/Parameters: step_priorities (list of str), steps, configurable
+# (steps that may be overridden, all steps when None)
+# Method output/Returned: dict of step -> nice value
+def step_nice(step_priorities=None, steps=STEPS, configurable=None):
+    configurable = configurable or tuple(steps)
+    on_path = set(critical_path(steps))
+    nice = {
+        step: 0 if step in on_path else OFF_PATH_NICE for step in steps
+    }
+    for entry in step_priorities or []:
+        step, _, value = entry.partition("=")
+        if step not in configurable:
+            raise ValueError(
+                "Unknown step '%s' in step priorities, expected one of: %s"
+                % (step, ", ".join(configurable))
+            )
+        try:
+            nice[step] = int(value)
+        except ValueError:
+            raise ValueError(
+                "Invalid step priority '%s', expected step=nice" % (entry)
+            )
+    return nice
+
+
+# Name: niced_binary
+# Process: pepsirf executable that runs at the given nice value. qiime2 starts
+# pepsirf as a subprocess of the pipeline (or of a worker under --parallel),
+# so the value is set by a small wrapper script that execs pepsirf. Wrappers
+# are kept until the interpreter exits, since under --parallel the steps run
+# after the pipeline function has returned.
+# Method Input/Parameters: pepsirf_binary, nice
+# Method output/Returned: path of the wrapper, pepsirf_binary for nice 0
+def niced_binary(pepsirf_binary, nice):
+    if not nice:
+        return pepsirf_binary
+    key = (pepsirf_binary, nice)
+    if key not in _wrappers:
+        tmp = tempfile.mkdtemp(prefix="q2-autopepsirf-nice-")
+        atexit.register(shutil.rmtree, tmp, True)
+        path = os.path.join(tmp, "pepsirf")
+        with open(path, "w") as fh:
+            fh.write(NICE_WRAPPER.format(
+                python=sys.executable, nice=int(nice), binary=pepsirf_binary
+            ))
+        os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR)
+        _wrappers[key] = path
+    return _wrappers[key]
@@ -0,0 +1,111 @@
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import weakref
+
+# everything a worker needs to attach to a shared matrix. Peptide names stay
+# in the parent, workers address rows by position.
+MatrixHandle = namedtuple("MatrixHandle", ["name", "shape", "dtype", "samples"])
+
+# matrix attached by a worker process, set by _init_worker
+_worker_shm = None
+_worker_values = None
+
+
+def _release(shm):
+    shm.close()
+    try:
+        shm.unlink()
+    except FileNotFoundError:
+        pass
+
+
+def _attach(name):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # before python 3.13 attaching also registers the segment, but pool
+        # workers share the parent's resource tracker so this is a no-op
+        return shared_memory.SharedMemory(name=name)
+
+
+# Name: SharedMatrix
+# Process: copies a PeptideMatrix into a shared memory block once, so worker
+# processes can attach to it without reloading or pickling the data. The
+# block is unlinked when the context exits (including on an exception or
+# KeyboardInterrupt from SIGINT), or at the latest when the interpreter exits.
+# Method Input/Parameters: matrix (PeptideMatrix)
+class SharedMatrix:
+    def __init__(self, matrix):
+        values = np.ascontiguousarray(matrix.values)
+        self._shm = shared_memory.SharedMemory(
+            create=True, size=max(1, values.nbytes)
+        )
+        self._finalizer = weakref.finalize(self, _release, self._shm)
+        self.values = np.ndarray(
+            values.shape, dtype=values.dtype, buffer=self._shm.buf
+        )
+        self.values[...] = values
+        self.handle = MatrixHandle(
+            self._shm.name, values.shape, values.dtype.str,
+            tuple(matrix.samples)
+        )
+
+    def close(self):
+        self.values = None
+        self._finalizer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# Name: attach
+# Process: zero-copy view of a shared matrix from its handle
+# Method Input/Parameters: handle (MatrixHandle)
+# Method output/Returned: shared memory block, numpy array backed by it
+def attach(handle):
+    shm = _attach(handle.name)
+    values = np.ndarray(
+        handle.shape, dtype=np.dtype(handle.dtype), buffer=shm.buf
+    )
+    return shm, values
+
+
+def _init_worker(handle):
+    global _worker_shm, _worker_values
+    _worker_shm, _worker_values = attach(handle)
+
+
+def _run_group(args):
+    func, columns, extra = args
+    return func(_worker_values, columns, *extra)
+
+
+# Name: map_column_groups
+# Process: runs func(values, column_indexes, *extra) for every group of
+# samples. With more than one worker the matrix is shared once with a process
+# pool and every worker attaches to it instead of receiving a copy.
+# Method Input/Parameters: matrix (PeptideMatrix), func (module level
+# function), groups (list of lists of sample names), n_workers, extra (extra
+# positional arguments passed to func)
+# Method output/Returned: list of func results, in the order of groups
+def map_column_groups(matrix, func, groups, n_workers=1, extra=()):
+    columns = [matrix.sample_ids(group) for group in groups]
+    if n_workers <= 1 or len(groups) <= 1:
+        return [func(matrix.values, cols, *extra) for cols in columns]
+
+    with SharedMatrix(matrix) as shared, ProcessPoolExecutor(
+            max_workers=n_workers,
+            initializer=_init_worker,
+            initargs=(shared.handle,)) as pool:
+        chunksize = max(1, len(columns) // (4 * n_workers))
+        return list(pool.map(
+            _run_group,
+            [(func, cols, extra) for cols in columns],
+            chunksize=chunksize
+        ))
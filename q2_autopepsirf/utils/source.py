@@ -0,0 +1,70 @@
+from collections import defaultdict
+
+import csv
+
+
+# Name: group_sources
+# Process: groups sample names by their name minus the final "_" suffix, which
+# is how replicates of the same sample are inferred (Ex: VW_100_1X_A and
+# VW_100_1X_B are both from VW_100_1X)
+# Method Input/Parameters: samples
+# Method output/Returned: dictionary of source name to list of samples
+def group_sources(samples):
+    sourceDic = defaultdict(list)
+    for sample in samples:
+        sourceDic[sample.rsplit("_", 1)[0]].append(sample)
+    return sourceDic
+
+
+# Name: write_source_file
+# Process: writes a source file with column 1 as the sample names and column 2
+# as the source column, following the selected replicate approach
+# Method Input/Parameters: sourceDic, path, flexible_reps_source,
+# s_enrich_source, infer_pairs_source
+# Method output/Returned: None
+def write_source_file(
+        sourceDic,
+        path,
+        flexible_reps_source=False,
+        s_enrich_source=False,
+        infer_pairs_source=True):
+    with open(path, "w") as tsvWriter:
+        writer = csv.writer(tsvWriter, delimiter="\t")
+        writer.writerow(["sampleID", "source"])
+        for srce, samples in sourceDic.items():
+            if flexible_reps_source:
+                for name in samples:
+                    writer.writerow([name, srce])
+            elif s_enrich_source:
+                for name in samples:
+                    writer.writerow([name, name])
+            elif infer_pairs_source:
+                if len(samples) > 1:
+                    for name in samples:
+                        writer.writerow([name, srce])
+
+
+# Name: column_groups
+# Process: groups the samples of a source metadata column by their source
+# Method Input/Parameters: source_col (qiime2 MetadataColumn)
+# Method output/Returned: dictionary of source name to list of samples
+def column_groups(source_col):
+    groups = defaultdict(list)
+    for sample, srce in source_col.to_series().items():
+        groups[srce].append(sample)
+    return groups
+
+
+# Name: split_groups
+# Process: finds the groups with samples both in a previous run and outside of
+# it (Ex: VW_100_1X_A sequenced in the first wave and VW_100_1X_B in the
+# second), which a run over the new samples alone cannot pair
+# Method Input/Parameters: groups (dictionary of source name to samples),
+# previous (samples of the previous run)
+# Method output/Returned: sorted list of the split source names
+def split_groups(groups, previous):
+    previous = set(previous)
+    return sorted(
+        srce for srce, samples in groups.items()
+        if len({sample in previous for sample in samples}) > 1
+    )
@@ -0,0 +1,28 @@
+import os
+
+
+# Name: available_cpus
+# Process: number of cores this process may run on. The affinity mask is used
+# where the platform has one, so a run restricted by taskset, cgroups or a
+# batch scheduler does not start a thread for every core of the machine
+# Method Input/Parameters: None
+# Method output/Returned: number of usable cores, at least one
+def available_cpus():
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0)) or 1
+    return os.cpu_count() or 1
+
+
+# Name: ThreadBudget
+# Process: number of threads a pipeline may use, split between the steps that
+# can run at the same time under qiime2's parallel pipeline executor so they
+# do not oversubscribe the cores
+# Method Input/Parameters: n_threads (None for every available core)
+class ThreadBudget:
+    def __init__(self, n_threads=None):
+        self.total = n_threads or available_cpus()
+
+    # threads of each of n_concurrent steps running alongside reserved
+    # single-threaded steps, at least one
+    def share(self, n_concurrent=1, reserved=0):
+        return max(1, (self.total - reserved) // max(1, n_concurrent))
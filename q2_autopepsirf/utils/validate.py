@@ -0,0 +1,187 @@
+from collections import Counter
+from q2_autopepsirf.utils.ids import IdTable, read_bins
+
+import numpy as np
+import warnings
+
+# maximum number of offending names listed in an error message
+MAX_REPORTED = 5
+
+
+# Name: read_samples
+# Process: sample names of a pepsirf matrix, read from its header only
+# Method Input/Parameters: filepath
+# Method output/Returned: list of sample names
+def read_samples(filepath):
+    with open(filepath) as fh:
+        return fh.readline().rstrip("\r\n").split("\t")[1:]
+
+
+# Name: read_matrix_ids
+# Process: streams a pepsirf matrix and collects its sample names (header) and
+# peptide names (first column) without parsing any of the values
+# Method Input/Parameters: filepath
+# Method output/Returned: list of sample names, IdTable of peptide names
+def read_matrix_ids(filepath):
+    samples = read_samples(filepath)
+    with open(filepath) as fh:
+        fh.readline()
+        peptides = IdTable(
+            line.split("\t", 1)[0] for line in fh if line.strip()
+        )
+    return samples, peptides
+
+
+# Name: missing_peptides
+# Process: names of the peptides whose ids do not appear in any of the id
+# arrays (ids of -1, for peptides unknown to the table, are ignored)
+# Method Input/Parameters: peptide_ids (IdTable), id_arrays
+# Method output/Returned: list of peptide names
+def missing_peptides(peptide_ids, id_arrays):
+    covered = np.zeros(len(peptide_ids), dtype=bool)
+    for ids in id_arrays:
+        covered[ids[ids >= 0]] = True
+    return peptide_ids.decode(np.flatnonzero(~covered))
+
+
+# Name: parse_thresh
+# Process: checks a threshold string of one or two comma separated numbers
+# (Ex: "6,10" or "30")
+# Method Input/Parameters: value
+# Method output/Returned: list of thresholds as floats
+def parse_thresh(value):
+    fields = str(value).split(",")
+    if len(fields) > 2:
+        raise ValueError
+    return [float(field) for field in fields]
+
+
+def _describe(names):
+    names = sorted(names)
+    shown = ", ".join(names[:MAX_REPORTED])
+    if len(names) > MAX_REPORTED:
+        shown += ", ... (%d total)" % (len(names))
+    return shown
+
+
+# Name: validate_inputs
+# Process: cheap pre-flight checks run before any pepsirf step is launched.
+# Only the headers and first columns of the matrices are read, and sample and
+# peptide names are cross-checked with sets, so problems are reported in
+# seconds instead of after normalization and z scores have been computed.
+# Peptides missing from the negative control or the bins are only warned
+# about, since pepsirf runs with them (they are left unscored).
+# Method Input/Parameters: raw_data_path, bins_path, negative_control_path,
+# negative_id, negative_names, negative_stats, thresh_file_path,
+# exact_z_thresh, exact_cs_thresh, exact_zenrich_thresh, source_samples
+# Method output/Returned: None, raises ValueError listing every problem found
+def validate_inputs(
+        raw_data_path,
+        bins_path,
+        negative_control_path=None,
+        negative_id=None,
+        negative_names=None,
+        negative_stats=False,
+        thresh_file_path=None,
+        exact_z_thresh=None,
+        exact_cs_thresh=None,
+        exact_zenrich_thresh=None,
+        source_samples=None):
+    errors = []
+
+    raw_samples, raw_peptides = read_matrix_ids(raw_data_path)
+    raw_sample_set = set(raw_samples)
+    if not raw_samples or not len(raw_peptides):
+        errors.append("Raw data %s has no samples or no peptides."
+            % (raw_data_path))
+    if len(raw_sample_set) != len(raw_samples):
+        dupes = [s for s, n in Counter(raw_samples).items() if n > 1]
+        errors.append("Raw data has duplicate sample names: %s"
+            % (_describe(dupes)))
+
+    # negative controls are taken from the negative control matrix when one is
+    # provided, otherwise from the raw data itself
+    neg_samples = raw_sample_set
+    if negative_control_path:
+        neg_list, neg_peptides = read_matrix_ids(negative_control_path)
+        neg_samples = set(neg_list)
+        missing = missing_peptides(
+            raw_peptides, [raw_peptides.encode(neg_peptides, add=False)]
+        )
+        if missing:
+            warnings.warn("Peptides in the raw data are missing from the"
+                " negative control: %s" % (_describe(missing)))
+
+    # negative control statistics replace the control samples, so there are
+    # no samples to select by name or id
+    if negative_stats and (negative_id or negative_names):
+        errors.append("negative-id and negative-names cannot be combined with"
+            " negative-stats.")
+        negative_id = negative_names = None
+
+    if negative_names:
+        missing = set(negative_names) - neg_samples
+        if missing:
+            errors.append("Negative control names not found in the %s: %s"
+                % ("negative control" if negative_control_path else "raw data",
+                   _describe(missing)))
+
+    if negative_id and not any(s.startswith(negative_id) for s in neg_samples):
+        errors.append("No %s sample starts with negative id '%s'."
+            % ("negative control" if negative_control_path else "raw data",
+               negative_id))
+
+    missing = missing_peptides(
+        raw_peptides, read_bins(bins_path, raw_peptides)
+    )
+    if missing:
+        warnings.warn("Peptides in the raw data are not in any bin: %s"
+            % (_describe(missing)))
+
+    if source_samples is not None:
+        missing = set(source_samples) - raw_sample_set
+        if missing:
+            errors.append("Source samples not found in the raw data: %s"
+                % (_describe(missing)))
+
+    for name, value in (
+            ("exact_z_thresh", exact_z_thresh),
+            ("exact_cs_thresh", exact_cs_thresh)):
+        if value is None:
+            continue
+        try:
+            parse_thresh(value)
+        except ValueError:
+            errors.append("Invalid %s '%s', expected one or two comma"
+                " separated numbers (Ex: 6,10 or 30)." % (name, value))
+
+    if exact_zenrich_thresh:
+        try:
+            firsts = [parse_thresh(value)[0] for value in exact_zenrich_thresh]
+            if firsts != sorted(firsts, reverse=True):
+                errors.append("exact_zenrich_thresh must be in descending"
+                    " order: %s" % (" ".join(exact_zenrich_thresh)))
+        except ValueError:
+            errors.append("Invalid exact_zenrich_thresh '%s', expected"
+                " thresholds like '25 10 3' or '6,25 4,10 1,3'."
+                % (" ".join(exact_zenrich_thresh)))
+
+    if thresh_file_path:
+        with open(thresh_file_path) as fh:
+            for lineno, line in enumerate(fh, 1):
+                if not line.strip():
+                    continue
+                fields = line.rstrip("\r\n").split("\t")
+                try:
+                    if len(fields) != 2:
+                        raise ValueError
+                    parse_thresh(fields[1])
+                except ValueError:
+                    errors.append("Threshold file line %d is not a matrix name"
+                        " and threshold(s) separated by a tab: %s"
+                        % (lineno, line.strip()))
+
+    if errors:
+        raise ValueError(
+            "Input validation failed:\n  " + "\n  ".join(errors)
+        )
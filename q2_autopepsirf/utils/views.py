@@ -0,0 +1,88 @@
+from collections import OrderedDict
+
+import os
+import sys
+import warnings
+
+
+# Name: view_size
+# Process: estimates the memory held by a materialized view. File formats are
+# counted by the size of their file(s) on disk.
+# Method Input/Parameters: view
+# Method output/Returned: size in bytes
+def view_size(view):
+    if hasattr(view, "memory_usage"):
+        usage = view.memory_usage(deep=True)
+        return int(usage.sum()) if hasattr(usage, "sum") else int(usage)
+    if hasattr(view, "nbytes"):
+        return int(view.nbytes)
+    if hasattr(view, "path"):
+        path = str(view.path)
+        if os.path.isdir(path):
+            return sum(
+                os.path.getsize(os.path.join(root, name))
+                for root, _, names in os.walk(path) for name in names
+            )
+        if os.path.isfile(path):
+            return os.path.getsize(path)
+    return sys.getsizeof(view)
+
+
+# Name: ViewCache
+# Process: per-run cache of artifact views keyed by (artifact uuid, view type),
+# so an artifact viewed by several steps is only materialized once. Views are
+# evicted least recently used first once the byte budget is exceeded. The
+# keep_recent most recently used views are never evicted, so a step reading
+# two matrices in turn does not reparse them on every call: the budget is a
+# soft limit, and a warning is issued the first time they exceed it.
+# Method Input/Parameters: max_bytes (None for no limit), n_workers (workers
+# used to parse views, None for every core), keep_recent
+class ViewCache:
+    def __init__(self, max_bytes=None, n_workers=None, keep_recent=2):
+        self.max_bytes = max_bytes
+        self.n_workers = n_workers
+        self.keep_recent = keep_recent
+        self.used_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._warned = False
+        self._views = OrderedDict()
+
+    def view(self, artifact, view_type):
+        return self.load(artifact, view_type, lambda a: a.view(view_type))
+
+    # same as view, for representations built by a custom loader
+    def load(self, artifact, view_type, loader):
+        key = (str(artifact.uuid), view_type)
+        if key in self._views:
+            self.hits += 1
+            self._views.move_to_end(key)
+            return self._views[key][0]
+
+        self.misses += 1
+        result = loader(artifact)
+        size = view_size(result)
+        self._views[key] = (result, size)
+        self.used_bytes += size
+        self._evict()
+        return result
+
+    def _evict(self):
+        if self.max_bytes is None:
+            return
+        while (self.used_bytes > self.max_bytes
+               and len(self._views) > self.keep_recent):
+            _, (_, size) = self._views.popitem(last=False)
+            self.used_bytes -= size
+        if self.used_bytes > self.max_bytes and not self._warned:
+            self._warned = True
+            warnings.warn(
+                "The %d most recently used views take %d MB, more than the"
+                " view cache budget of %d MB. They are kept in memory."
+                % (len(self._views), self.used_bytes // (1024 * 1024),
+                   self.max_bytes // (1024 * 1024))
+            )
+
+    def clear(self):
+        self._views.clear()
+        self.used_bytes = 0
@@ -0,0 +1,71 @@
+from q2_autopepsirf.utils.validate import parse_thresh
+
+import numpy as np
+
+
+# Name: z_grid
+# Process: z score thresholds evaluated by zenrich, from lower_z_thresh
+# (inclusive) up to upper_z_thresh (non-inclusive) in steps of step_z_thresh
+# Method Input/Parameters: lower_z_thresh, upper_z_thresh, step_z_thresh
+# Method output/Returned: float64 array of thresholds
+def z_grid(lower_z_thresh, upper_z_thresh, step_z_thresh):
+    return np.arange(lower_z_thresh, upper_z_thresh, step_z_thresh,
+                     dtype=np.float64)
+
+
+# a replicate group passes a one or two value threshold when every replicate
+# passes the lower value and at least one passes the higher value
+def _passes(low, high, thresh):
+    values = parse_thresh(thresh)
+    return (low >= min(values)) & (high >= max(values))
+
+
+# Name: grid_counts
+# Process: number of enriched peptides of every replicate group at every z
+# threshold of the grid. The per-peptide minimum z score of a group (with
+# peptides failing the col-sum threshold masked out) is sorted once, and the
+# counts for the whole grid come from a single searchsorted, instead of one
+# enrichment run per threshold. Exact threshold pairs are counted directly.
+# Method Input/Parameters: zscores, col_sum (PeptideMatrix with the same
+# peptides), groups (dict of group name -> sample names), grid, exact_z_thresh
+# (list of one or two value strings), exact_cs_thresh
+# Method output/Returned: list of column labels, dict of group -> count array
+def grid_counts(zscores, col_sum, groups, grid, exact_z_thresh=None,
+                exact_cs_thresh="20"):
+    # align the col-sum rows with the z score rows
+    cs_rows = col_sum.peptides.encode(zscores.peptides, add=False)
+    if (cs_rows < 0).any():
+        raise ValueError("The col-sum and z score matrices do not contain the"
+            " same peptides.")
+    exact_z_thresh = exact_z_thresh or []
+    labels = ["%g" % (z) for z in grid] + list(exact_z_thresh)
+
+    counts = {}
+    for group, samples in groups.items():
+        z = zscores.columns(samples)
+        cs = col_sum.columns(samples)[cs_rows]
+        z_low, z_high = z.min(axis=1), z.max(axis=1)
+        cs_ok = _passes(cs.min(axis=1), cs.max(axis=1), exact_cs_thresh)
+
+        # NaN z scores never pass, so they are masked along with failed cs
+        passing = np.sort(np.where(cs_ok & ~np.isnan(z_low), z_low, -np.inf))
+        at_grid = len(passing) - np.searchsorted(passing, grid, side="left")
+
+        at_exact = [
+            np.count_nonzero(cs_ok & _passes(z_low, z_high, thresh))
+            for thresh in exact_z_thresh
+        ]
+        counts[group] = np.concatenate([at_grid, at_exact]).astype(np.int64)
+    return labels, counts
+
+
+# Name: write_grid_counts
+# Process: writes grid counts as a tsv with one row per replicate group and
+# one column per threshold
+# Method Input/Parameters: filepath, labels, counts
+# Method output/Returned: None
+def write_grid_counts(filepath, labels, counts):
+    with open(filepath, "w") as fh:
+        fh.write("\t".join(["Source"] + labels) + "\n")
+        for group, row in counts.items():
+            fh.write("\t".join([group] + [str(n) for n in row]) + "\n")